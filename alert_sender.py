@@ -0,0 +1,178 @@
+"""
+Non-blocking alert delivery for the detector.
+
+The frame loop hands alerts to AlertSender.submit(), which only appends to an
+in-memory queue. A background thread posts them over a keep-alive
+requests.Session, retrying with exponential backoff and jitter. Undelivered
+alerts are mirrored to a bounded JSON-lines spool file so they survive network
+outages and restarts, and are delivered in order once the server is reachable.
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+# client errors that will not go away by retrying
+_RETRYABLE_4XX = (408, 425, 429)
+
+
+class AlertSender:
+    """Background alert sender with retry/backoff and an on-disk spool.
+
+    spool_path: JSON-lines file for undelivered alerts (None disables the spool).
+    spool_max: oldest alerts are discarded beyond this many pending entries.
+    on_sent: optional callback(seconds from submit to delivery).
+    """
+
+    def __init__(self, spool_path='alert_spool.jsonl', spool_max=500, timeout=5.0,
+                 backoff_base=0.5, backoff_max=60.0, queue_size=1000, on_sent=None):
+        self.spool_path = spool_path
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_sent = on_sent
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = deque(maxlen=spool_max)
+        self._stop = threading.Event()
+        self._thread = None
+        self._session = None
+
+        self.sent = 0
+        self.failed_attempts = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._load_spool()
+
+    def submit(self, url, payload):
+        """Queue an alert for delivery; never blocks."""
+        item = {'url': url, 'payload': payload, 'submitted': time.time()}
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            print(f"Alert queue full, dropping alert for {payload.get('driver_id')}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='alert-sender', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'pending': len(self._pending),
+            'sent': self.sent,
+            'failed_attempts': self.failed_attempts,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+        }
+
+    # --- background thread ---
+
+    def _open_session(self):
+        # requests is imported here, on the sender thread, to keep it off the detector's startup path
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def _run(self):
+        if self._session is None:
+            self._open_session()
+        attempt = 0
+        next_attempt = 0.0
+        while not self._stop.is_set():
+            # collect new alerts; while backing off this doubles as the sleep,
+            # and alerts arriving in the meantime only join the queue
+            wait = max(0.0, next_attempt - time.monotonic()) if self._pending else 0.5
+            try:
+                item = self._queue.get(timeout=wait)
+                self._add_pending(item)
+                while True:
+                    self._add_pending(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not self._pending or time.monotonic() < next_attempt:
+                continue
+            item = self._pending[0]
+            ok = self._send(item)
+            if ok is None:
+                # network/server trouble: keep it and back off
+                attempt += 1
+                wait = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                next_attempt = time.monotonic() + wait * random.uniform(0.5, 1.5)
+                continue
+            self._pending.popleft()
+            self._save_spool()
+            attempt = 0
+            next_attempt = 0.0
+            if ok and self.on_sent:
+                try:
+                    self.on_sent(time.time() - item['submitted'])
+                except Exception:
+                    pass
+
+    def _send(self, item):
+        """True on delivery, False if the server rejected it for good, None to retry."""
+        import requests
+        url = item['url']
+        try:
+            resp = self._session.post(url, json=item['payload'], timeout=self.timeout)
+        except requests.RequestException as e:
+            self.failed_attempts += 1
+            print(f"Failed to POST alert to {url}: {e}")
+            return None
+        if resp.status_code < 400:
+            self.sent += 1
+            print(f"POST {url} -> {resp.status_code}: {resp.text}")
+            return True
+        if resp.status_code < 500 and resp.status_code not in _RETRYABLE_4XX:
+            self.rejected += 1
+            print(f"Alert rejected by {url} -> {resp.status_code}: {resp.text}")
+            return False
+        self.failed_attempts += 1
+        print(f"POST {url} -> {resp.status_code}, will retry")
+        return None
+
+    def _add_pending(self, item):
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append(item)
+        self._save_spool()
+
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return
+        try:
+            with open(self.spool_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self._pending.append(json.loads(line))
+        except Exception as e:
+            print(f"Could not read alert spool {self.spool_path}: {e}")
+        if self._pending:
+            print(f"Loaded {len(self._pending)} undelivered alert(s) from {self.spool_path}")
+
+    def _save_spool(self):
+        if not self.spool_path:
+            return
+        tmp = self.spool_path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for item in self._pending:
+                    f.write(json.dumps(item) + '\n')
+            os.replace(tmp, self.spool_path)
+        except Exception as e:
+            print(f"Could not write alert spool {self.spool_path}: {e}")
@@ -1,12 +1,14 @@
 import json
+import os
 import time
 import threading
 from queue import Queue
-from math import radians, cos, sin, asin, sqrt
 from flask import Flask, request, jsonify, Response, send_from_directory, redirect, url_for
 from flask_socketio import SocketIO
+import numpy as np
 
 import detect
+from backend.utils.distance import haversine_km_many
 
 app = Flask(__name__, static_url_path='', static_folder='static')
 
@@ -21,29 +23,67 @@ tollbooth_notifications = []
 # Simple pubsub for SSE
 clients = []
 
+TOLLBOOTHS_FILE = os.environ.get('TOLLBOOTHS_FILE', 'tollbooths.json')
+# notify every tollbooth within this many km of an alert (0: only the nearest one)
+TOLL_NOTIFY_RADIUS_KM = float(os.environ.get('TOLL_NOTIFY_RADIUS_KM') or 0.0)
 
-def haversine(lat1, lon1, lat2, lon2):
-    # return distance in kilometers
-    # convert decimal degrees to radians
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    km = 6371 * c
-    return km
+# (file key, booths, lats, lons), replaced as a whole on reload
+_tolls = (None, [], np.empty(0), np.empty(0))
+_tolls_lock = threading.Lock()
+
+
+def _load_tolls():
+    """The booth list and its coordinate arrays; tollbooths.json is re-read only when it changes."""
+    global _tolls
+    try:
+        st = os.stat(TOLLBOOTHS_FILE)
+        key = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = None
+    cached = _tolls
+    if cached[0] == key:
+        return cached
+    with _tolls_lock:
+        if _tolls[0] == key:
+            return _tolls
+        tolls = []
+        if key is not None:
+            try:
+                with open(TOLLBOOTHS_FILE, 'r', encoding='utf-8') as f:
+                    raw = json.load(f)
+            except ValueError as e:
+                # probably caught mid-write; keep the old list and retry on the next alert
+                print(f"Could not parse {TOLLBOOTHS_FILE}: {e}")
+                return _tolls
+            for t in raw:
+                try:
+                    tolls.append((t, float(t['lat']), float(t['lon'])))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        _tolls = (key, [t[0] for t in tolls], np.array([t[1] for t in tolls], dtype=np.float64),
+                  np.array([t[2] for t in tolls], dtype=np.float64))
+        return _tolls
+
+
+def find_tolls(lat, lon, radius_km=0.0):
+    """Nearest booth, its distance and every (booth, km) within radius_km, closest first.
+
+    One vectorised haversine pass over all booths; (None, None, []) without booths.
+    """
+    _, tolls, lats, lons = _load_tolls()
+    if not tolls:
+        return None, None, []
+    d = haversine_km_many(float(lat), float(lon), lats, lons)
+    best = int(np.argmin(d))
+    within = []
+    if radius_km > 0:
+        idx = np.flatnonzero(d <= radius_km)
+        within = [(tolls[i], float(d[i])) for i in idx[np.argsort(d[idx], kind='stable')]]
+    return tolls[best], float(d[best]), within
 
 
 def find_nearest_toll(lat, lon):
-    with open('tollbooths.json', 'r', encoding='utf-8') as f:
-        tolls = json.load(f)
-    best = None
-    best_d = None
-    for t in tolls:
-        d = haversine(lat, lon, t['lat'], t['lon'])
-        if best is None or d < best_d:
-            best = t
-            best_d = d
+    best, best_d, _ = find_tolls(lat, lon)
     return best, best_d
 
 
@@ -112,15 +152,58 @@ def start_detection():
     driver_id = data.get('driver_id')
     if not driver_id:
         return jsonify({'error': 'missing driver_id'}), 400
-    # start detect thread bound to driver_id
-    detect.start_detection(driver_id, on_alert)
-    return jsonify({'status': 'started'})
+    # camera index or video path/URL; one session per driver unless session_id is given
+    source = data.get('source', 0)
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    # bad input is a 400; only an already running session is a 409 below
+    try:
+        detect_every = int(data.get('detect_every') or 1)
+        landmark_every = int(data.get('landmark_every') or 3)
+        target_fps = float(data['target_fps']) if data.get('target_fps') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'detect_every and landmark_every must be integers, target_fps a number'}), 400
+    if detect_every < 1 or landmark_every < 1 or (target_fps is not None and target_fps <= 0):
+        return jsonify({'error': 'detect_every, landmark_every and target_fps must be positive'}), 400
+    detector = data.get('detector') or 'haar'
+    if detector not in detect.BACKENDS:
+        return jsonify({'error': f"unknown detector {detector!r}; choose from {', '.join(sorted(detect.BACKENDS))}"}), 400
+    try:
+        session_id = detect.start_detection(driver_id, on_alert, webcam_index=source,
+                                            detect_every=detect_every,
+                                            landmark_every=landmark_every,
+                                            detector=detector,
+                                            session_id=data.get('session_id'),
+                                            shared_capture=bool(data.get('shared_capture')),
+                                            target_fps=target_fps)
+    except detect.PoolFullError as e:
+        resp = jsonify({'error': str(e)})
+        resp.headers['Retry-After'] = '5'
+        return resp, 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'status': 'started', 'session_id': session_id})
 
 
 @app.route('/stop_detection', methods=['POST'])
 def stop_detection():
-    detect.stop_detection()
-    return jsonify({'status': 'stopped'})
+    data = request.get_json(silent=True) or {}
+    # no session given: stop everything (previous single-session behaviour)
+    session_id = data.get('session_id') or data.get('driver_id')
+    if not detect.stop_detection(session_id):
+        return jsonify({'error': 'unknown session'}), 404
+    return jsonify({'status': 'stopped', 'session_id': session_id})
+
+
+@app.route('/detection_status', methods=['GET'])
+def detection_status():
+    session_id = request.args.get('session_id')
+    if session_id:
+        st = detect.detection_status(session_id)
+        if st is None:
+            return jsonify({'error': 'unknown session'}), 404
+        return jsonify(st)
+    return jsonify({'sessions': detect.detection_status()})
 
 
 @app.route('/alerts/stream')
@@ -160,8 +243,9 @@ def on_alert(driver_id, lat=None, lon=None, ts=None, details=None):
 
     nearest = None
     dist_km = None
+    nearby = []
     if lat is not None and lon is not None:
-        nearest, dist_km = find_nearest_toll(lat, lon)
+        nearest, dist_km, nearby = find_tolls(lat, lon, TOLL_NOTIFY_RADIUS_KM)
 
     alert = {
         'driver_id': driver_id,
@@ -173,31 +257,37 @@ def on_alert(driver_id, lat=None, lon=None, ts=None, details=None):
         'distance_km': dist_km,
         'details': details or {}
     }
+    if TOLL_NOTIFY_RADIUS_KM > 0:
+        alert['nearby_tolls'] = [{'id': t.get('id'), 'name': t.get('name'), 'distance_km': d} for t, d in nearby]
     alerts.append(alert)
 
-    # simulate sending notification to tollbooth endpoint
-    if nearest:
-        notif = {
-            'toll_id': nearest.get('id'),
-            'toll_name': nearest.get('name'),
+    # simulate sending notification to tollbooth endpoint: every booth within the
+    # notify radius, or the nearest one if none is that close (or no radius is set)
+    targets = nearby or ([(nearest, dist_km)] if nearest else [])
+    notifs = []
+    for toll, d in targets:
+        notifs.append({
+            'toll_id': toll.get('id'),
+            'toll_name': toll.get('name'),
             'driver_id': driver_id,
             'driver_location': {'lat': lat, 'lon': lon},
             'ts': ts,
-            'message': f"Drowsiness detected for Driver {driver_id}, {dist_km:.2f} km away from Tollbooth {nearest.get('name')}"
-        }
-    else:
-        notif = {
+            'distance_km': d,
+            'message': f"Drowsiness detected for Driver {driver_id}, {d:.2f} km away from Tollbooth {toll.get('name')}"
+        })
+    if not notifs:
+        notifs.append({
             'toll_id': None,
             'toll_name': None,
             'driver_id': driver_id,
             'driver_location': {'lat': lat, 'lon': lon},
             'ts': ts,
             'message': f"Drowsiness detected for Driver {driver_id}, location unknown"
-        }
-    tollbooth_notifications.append(notif)
+        })
+    tollbooth_notifications.extend(notifs)
 
-    # publish to SSE clients
-    publish_event({'type': 'alert', 'alert': alert, 'notification': notif})
+    # publish to SSE clients ('notification' is the closest booth's, for older clients)
+    publish_event({'type': 'alert', 'alert': alert, 'notification': notifs[0], 'notifications': notifs})
 
 
 
@@ -226,5 +316,9 @@ def receive_alert():
 
 
 if __name__ == '__main__':
+    # optionally load the detection models before any session forks a worker
+    if os.environ.get('DETECTOR_PREWARM', '').lower() in ('1', 'true', 'yes'):
+        info = detect.prewarm()
+        print(f"Detector models pre-warmed in {info['total_ms']:.0f}ms")
     # run Flask dev server via Socket.IO runner (supports websocket transport via eventlet/gevent)
     socketio.run(app, host='0.0.0.0', port=5000)
@@ -1,27 +1,100 @@
-from datetime import datetime
+import atexit
+from datetime import datetime, timezone
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from models import db, Alert, Location, User, Tollbooth
+from models import db, Alert, Location, LocationRollup, User, Tollbooth
+from ingest import IngestBusy, IngestWriter, enable_sqlite_wal
+from retention import LocationRetention
+from utils.spatial_index import TollboothIndex
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask import session
 
 
+def _parse_client_timestamp(value):
+    """Parse an ISO-8601 timestamp sent by a device into a naive UTC datetime (None if absent/invalid)."""
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _toll_entry(t):
+    """(id, lat, lon, info) for TollboothIndex; info is what alerts carry as nearest_toll."""
+    info = {'id': t.id, 'name': t.name, 'latitude': t.latitude, 'longitude': t.longitude, 'address': t.address}
+    return t.id, t.latitude, t.longitude, info
+
+
+def _location_payload(r):
+    return {
+        "id": r.id,
+        "driver_id": r.driver_id,
+        "latitude": r.latitude,
+        "longitude": r.longitude,
+        "accuracy": r.accuracy,
+        "timestamp": r.timestamp.isoformat() + "Z",
+    }
+
+
+def _busy():
+    # ingest queue full: ask the device to retry shortly rather than buffering without bound
+    resp = jsonify({"error": "Server busy, retry later"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+
 def create_app() -> Flask:
     app = Flask(__name__, static_folder="static", template_folder="templates")
 
     app.config["SECRET_KEY"] = "change-this-secret"
     app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///alerts.db"
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # write-behind ingestion of locations/alerts: commit every N rows or after max delay seconds
+    app.config["INGEST_BATCH_SIZE"] = 200
+    app.config["INGEST_MAX_DELAY"] = 0.5
+    app.config["INGEST_QUEUE_SIZE"] = 10000
+    app.config["INGEST_SUBMIT_TIMEOUT"] = 1.0
+    # how long /api/alert waits for its (immediately flushed) commit before answering 202
+    app.config["ALERT_COMMIT_WAIT"] = 2.0
+    # location history: raw fixes for this many days, then one point per driver per
+    # bucket, kept for LOCATION_ROLLUP_DAYS (0 = forever)
+    app.config["LOCATION_RAW_DAYS"] = 7
+    app.config["LOCATION_ROLLUP_SECONDS"] = 60
+    app.config["LOCATION_ROLLUP_DAYS"] = 365
+    app.config["RETENTION_INTERVAL"] = 600.0
 
     CORS(app)
     db.init_app(app)
 
     socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
 
+    # nearest-tollbooth lookups are answered from memory; register_tollbooth keeps the index current
+    toll_index = TollboothIndex()
+
     # Ensure DB exists
     with app.app_context():
+        enable_sqlite_wal(db.engine)
         db.create_all()
+        # create_all skips tables that already exist, so add indexes introduced later by hand
+        for table in (Alert.__table__, Location.__table__):
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+        toll_index.load(_toll_entry(t) for t in Tollbooth.query.all())
+        ingest = IngestWriter(db.engine, batch_size=app.config["INGEST_BATCH_SIZE"],
+                              max_delay=app.config["INGEST_MAX_DELAY"],
+                              queue_size=app.config["INGEST_QUEUE_SIZE"],
+                              submit_timeout=app.config["INGEST_SUBMIT_TIMEOUT"]).start()
+        retention = LocationRetention(db.engine, raw_days=app.config["LOCATION_RAW_DAYS"],
+                                      bucket_seconds=app.config["LOCATION_ROLLUP_SECONDS"],
+                                      rollup_days=app.config["LOCATION_ROLLUP_DAYS"],
+                                      interval=app.config["RETENTION_INTERVAL"]).start()
+    atexit.register(ingest.stop)
+    atexit.register(retention.stop)
 
     @app.route("/")
     def index():
@@ -151,7 +224,8 @@ def create_app() -> Flask:
         except Exception:
             return jsonify({"error": "latitude/longitude must be numbers"}), 400
 
-        now = datetime.utcnow()
+        # devices spooling alerts through an outage send the time the alert fired
+        now = _parse_client_timestamp(data.get("timestamp")) or datetime.utcnow()
         alert = Alert(
             driver_id=str(data["driver_id"]),
             latitude=latitude,
@@ -159,53 +233,60 @@ def create_app() -> Flask:
             status=str(data["status"]),
             timestamp=now,
         )
-        db.session.add(alert)
-        db.session.commit()
 
         # build payload and attempt to attach nearest tollbooth info
         payload = {
-            "id": alert.id,
+            "id": None,
             "driver_id": alert.driver_id,
             "latitude": alert.latitude,
             "longitude": alert.longitude,
             "status": alert.status,
             "timestamp": now.isoformat() + "Z",
         }
+        # optional driver-state metrics from the detector (PERCLOS 0..1, blinks per minute)
+        for key in ("perclos", "blinks_per_min"):
+            try:
+                if data.get(key) is not None:
+                    payload[key] = float(data[key])
+            except (TypeError, ValueError):
+                pass
 
-        # compute nearest tollbooth (if any)
+        # nearest tollbooth (if any) from the in-memory index; no table scan on the alert path
         try:
-            def haversine_km(lat1, lon1, lat2, lon2):
-                from math import radians, sin, cos, sqrt, atan2
-                R = 6371.0
-                dlat = radians(lat2 - lat1)
-                dlon = radians(lon2 - lon1)
-                a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-                c = 2 * atan2(sqrt(a), sqrt(1-a))
-                return R * c
-
-            tolls = Tollbooth.query.all()
-            best = None
-            best_dist = None
-            for t in tolls:
-                try:
-                    dkm = haversine_km(alert.latitude, alert.longitude, t.latitude, t.longitude)
-                except Exception:
-                    continue
-                if best is None or dkm < best_dist:
-                    best = t
-                    best_dist = dkm
+            best = toll_index.nearest(alert.latitude, alert.longitude)
             if best is not None:
-                payload['nearest_toll'] = {'id': best.id, 'name': best.name, 'latitude': best.latitude, 'longitude': best.longitude, 'address': best.address}
-                payload['distance_km'] = float(best_dist)
+                payload['nearest_toll'] = dict(best[0])
+                payload['distance_km'] = best[1]
         except Exception:
             # non-fatal: still emit without nearest toll info
             pass
 
-        socketio.emit("drowsiness_alert", payload)
+        def _committed(rows):
+            payload["id"] = rows[0].id
+            socketio.emit("drowsiness_alert", payload)
+
+        # alerts skip the batching delay; the dashboard hears about it once it is stored
+        try:
+            ticket = ingest.submit(alert, flush=True, on_commit=_committed)
+        except IngestBusy:
+            return _busy()
+        if not ticket.wait(app.config["ALERT_COMMIT_WAIT"]):
+            if ticket.error is not None:
+                return jsonify({"error": "Could not store alert"}), 500
+            # still queued; it will be stored and emitted (with its id) shortly
+            pending = {k: v for k, v in payload.items() if k != "id"}
+            return jsonify({"success": True, "queued": True, "alert": pending}), 202
         return jsonify({"success": True, "alert": payload}), 201
 
     @app.post("/api/location")
     def receive_location():
+        """Queue one fix for the ingest writer.
+
+        Answers 202 as soon as the fix is queued. The row has no id until the
+        writer commits it, so the "location" in the response carries none;
+        the "location_update" Socket.IO event sent after the commit does.
+        Answers 503 with Retry-After when the ingest queue is full.
+        """
         try:
             data = request.get_json(force=True) or {}
         except Exception:
@@ -222,7 +303,7 @@ def create_app() -> Flask:
         except Exception:
             return jsonify({"error": "latitude/longitude must be numbers"}), 400
 
-        # persist location to DB
+        # persist location to DB (batched by the ingest writer)
         loc = Location(
             driver_id=str(data.get("driver_id")),
             latitude=latitude,
@@ -230,21 +311,60 @@ def create_app() -> Flask:
             accuracy=(float(data.get("accuracy")) if data.get("accuracy") is not None else None),
             timestamp=datetime.utcnow(),
         )
-        db.session.add(loc)
-        db.session.commit()
+        payload = _location_payload(loc)
+        del payload["id"]
 
-        payload = {
-            "id": loc.id,
-            "driver_id": loc.driver_id,
-            "latitude": loc.latitude,
-            "longitude": loc.longitude,
-            "accuracy": loc.accuracy,
-            "timestamp": loc.timestamp.isoformat() + "Z",
-        }
+        # emit a socket.io event once stored so dashboard clients receive live location updates
+        try:
+            ingest.submit(loc, on_commit=lambda rows: socketio.emit("location_update", _location_payload(rows[0])))
+        except IngestBusy:
+            return _busy()
+        return jsonify({"success": True, "queued": True, "location": payload}), 202
+
+    @app.post("/api/locations/bulk")
+    def receive_locations_bulk():
+        """Queue a batch of fixes from one device; the ingest writer commits them together.
+
+        Body: {"driver_id": ..., "locations": [{"latitude", "longitude", "accuracy"?, "timestamp"?}, ...]}
+        Entries with bad coordinates are skipped and counted in "rejected".
+        """
+        try:
+            data = request.get_json(force=True) or {}
+        except Exception:
+            return jsonify({"error": "Invalid JSON"}), 400
+
+        driver_id = data.get("driver_id")
+        fixes = data.get("locations")
+        if not driver_id or not isinstance(fixes, list):
+            return jsonify({"error": "driver_id and a locations list are required"}), 400
+
+        rows = []
+        rejected = 0
+        for fix in fixes:
+            try:
+                latitude = float(fix["latitude"])
+                longitude = float(fix["longitude"])
+                accuracy = float(fix["accuracy"]) if fix.get("accuracy") is not None else None
+            except Exception:
+                rejected += 1
+                continue
+            rows.append(Location(
+                driver_id=str(driver_id),
+                latitude=latitude,
+                longitude=longitude,
+                accuracy=accuracy,
+                timestamp=_parse_client_timestamp(fix.get("timestamp")) or datetime.utcnow(),
+            ))
+        if rows:
+            # dashboards only need the newest position of the batch
+            def _committed(stored):
+                socketio.emit("location_update", _location_payload(max(stored, key=lambda r: r.timestamp)))
 
-        # emit a socket.io event so dashboard clients receive live location updates
-        socketio.emit("location_update", payload)
-        return jsonify({"success": True, "location": payload}), 200
+            try:
+                ingest.submit(rows, on_commit=_committed)
+            except IngestBusy:
+                return _busy()
+        return jsonify({"success": True, "accepted": len(rows), "rejected": rejected}), 202
 
     @app.post('/api/tollbooth')
     @login_required
@@ -281,6 +401,7 @@ def create_app() -> Flask:
         tb = Tollbooth(name=str(name), latitude=latitude, longitude=longitude, address=(address or None), owner_id=owner_id)
         db.session.add(tb)
         db.session.commit()
+        toll_index.add(*_toll_entry(tb))
 
         payload = tb.to_dict()
         # notify connected dashboards so they can update in real-time
@@ -322,7 +443,52 @@ def create_app() -> Flask:
             })
         return jsonify({'locations': out}), 200
 
+    @app.get('/api/locations/track')
+    def get_location_track():
+        """Downsampled history older than the raw window. Query params: driver_id (required), limit (default 1440)"""
+        driver_id = request.args.get('driver_id')
+        if not driver_id:
+            return jsonify({'error': 'missing driver_id'}), 400
+        try:
+            limit = int(request.args.get('limit') or 1440)
+        except Exception:
+            limit = 1440
+
+        rows = (
+            LocationRollup.query.filter_by(driver_id=str(driver_id))
+            .order_by(LocationRollup.bucket.desc()).limit(limit).all()
+        )
+        return jsonify({'track': [r.to_dict() for r in reversed(rows)]}), 200
+
+    @app.get('/api/ingest/stats')
+    def ingest_stats():
+        return jsonify(ingest.stats()), 200
+
+    @app.get('/api/retention/stats')
+    def retention_stats():
+        return jsonify(retention.stats()), 200
+
+    @app.get('/api/tollbooths/nearby')
+    def nearby_tollbooths():
+        """Tollbooths near a point: ?lat=&lon= plus k (default 5) and/or radius_km."""
+        try:
+            lat = float(request.args['lat'])
+            lon = float(request.args['lon'])
+            k = int(request.args.get('k', 5))
+            radius_km = request.args.get('radius_km')
+            radius_km = float(radius_km) if radius_km is not None else None
+        except (KeyError, ValueError):
+            return jsonify({'error': 'lat and lon are required numbers; k and radius_km must be numbers'}), 400
+
+        if radius_km is not None:
+            found = toll_index.within(lat, lon, radius_km)[:k]
+        else:
+            found = toll_index.k_nearest(lat, lon, k)
+        out = [dict(info, distance_km=dist) for info, dist in found]
+        return jsonify({'tollbooths': out}), 200
+
     app.socketio = socketio  # type: ignore[attr-defined]
+    app.ingest = ingest  # type: ignore[attr-defined]
     return app
 
 
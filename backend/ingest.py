@@ -0,0 +1,177 @@
+"""
+Write-behind ingestion for device traffic (locations, alerts).
+
+Request handlers validate a row, hand it to IngestWriter.submit() and answer
+right away. One writer thread does all of these inserts: it collects rows
+until `batch_size` are waiting or `max_delay` seconds have passed since the
+first one, then commits them in a single transaction, so SQLite pays one
+fsync per batch instead of one per request. A row submitted with flush=True
+(an alert) closes the batch at once, so alerts are not held back by the
+batching.
+
+The queue is bounded. When the writer falls behind, submit() waits up to
+`submit_timeout` and then raises IngestBusy, which the endpoints turn into
+503 + Retry-After so devices back off and retry instead of piling up memory.
+"""
+import queue
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class IngestBusy(Exception):
+    """The ingest queue stayed full for longer than submit_timeout."""
+
+
+class Ticket:
+    """Handle for submitted rows; wait() blocks until they are committed."""
+
+    def __init__(self, rows, flush, on_commit):
+        self.rows = rows
+        self.flush = flush
+        self.on_commit = on_commit
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """True once the rows are committed; False on timeout or if the insert failed."""
+        return self._done.wait(timeout) and self.error is None
+
+
+def enable_sqlite_wal(engine):
+    """WAL journal, relaxed fsync and a busy timeout on every SQLite connection.
+
+    WAL lets dashboard reads run while the writer commits; synchronous=NORMAL
+    only fsyncs at checkpoints, which WAL keeps crash-safe.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute('PRAGMA journal_mode=WAL')
+        cur.execute('PRAGMA synchronous=NORMAL')
+        cur.execute('PRAGMA busy_timeout=5000')
+        cur.close()
+
+
+class IngestWriter:
+    """Single background writer that commits submitted ORM rows in batches.
+
+    engine: SQLAlchemy engine (db.engine); the writer uses its own session so
+    committed rows stay readable (expire_on_commit=False) from any thread.
+    """
+
+    def __init__(self, engine, batch_size=200, max_delay=0.5, queue_size=10000, submit_timeout=1.0):
+        self.engine = engine
+        self.batch_size = max(1, int(batch_size))
+        self.max_delay = max_delay
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.committed = 0
+        self.batches = 0
+        self.failed = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.last_commit_ms = 0.0
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Commit whatever is queued, then stop the writer."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def submit(self, rows, flush=False, on_commit=None):
+        """Queue one row or a list of rows; returns a Ticket.
+
+        flush: commit as soon as this reaches the writer (alerts).
+        on_commit: callback(rows) run on the writer thread after the commit
+            (e.g. a Socket.IO emit that needs the new ids).
+        Raises IngestBusy when the queue stays full for submit_timeout seconds.
+        """
+        ticket = Ticket(rows if isinstance(rows, list) else [rows], flush, on_commit)
+        try:
+            self._queue.put(ticket, timeout=self.submit_timeout)
+        except queue.Full:
+            self.rejected += 1
+            raise IngestBusy() from None
+        return ticket
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'committed': self.committed,
+            'batches': self.batches,
+            'avg_batch': self.committed / self.batches if self.batches else 0.0,
+            'flushes': self.flushes,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'last_commit_ms': self.last_commit_ms,
+        }
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            batch = [first]
+            n = len(first.rows)
+            deadline = time.monotonic() + self.max_delay
+            while not batch[-1].flush and n < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    ticket = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(ticket)
+                n += len(ticket.rows)
+            if batch[-1].flush:
+                self.flushes += 1
+            self._commit(batch)
+
+    def _commit(self, batch):
+        rows = [row for ticket in batch for row in ticket.rows]
+        t0 = time.perf_counter()
+        try:
+            with Session(self.engine, expire_on_commit=False) as session:
+                session.add_all(rows)
+                session.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                # keep one bad row from sinking the rest of the batch
+                for ticket in batch:
+                    self._commit([ticket])
+                return
+            print(f"Ingest: dropping {len(rows)} row(s): {e}")
+            self.failed += len(rows)
+            batch[0].error = e
+            batch[0]._done.set()
+            return
+        self.last_commit_ms = (time.perf_counter() - t0) * 1000.0
+        self.committed += len(rows)
+        self.batches += 1
+        for ticket in batch:
+            if ticket.on_commit:
+                try:
+                    ticket.on_commit(ticket.rows)
+                except Exception as e:
+                    print(f"Ingest: on_commit callback failed: {e}")
+            ticket._done.set()
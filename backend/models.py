@@ -6,6 +6,8 @@ db = SQLAlchemy()
 
 
 class Alert(db.Model):
+    __table_args__ = (db.Index('ix_alert_driver_timestamp', 'driver_id', 'timestamp'),)
+
     id = db.Column(db.Integer, primary_key=True)
     driver_id = db.Column(db.String(50), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
@@ -15,6 +17,12 @@ class Alert(db.Model):
 
 
 class Location(db.Model):
+    # (driver_id, timestamp) serves "latest N for a driver"; timestamp alone serves retention
+    __table_args__ = (
+        db.Index('ix_location_driver_timestamp', 'driver_id', 'timestamp'),
+        db.Index('ix_location_timestamp', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     driver_id = db.Column(db.String(50), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
@@ -23,6 +31,32 @@ class Location(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
 
+class LocationRollup(db.Model):
+    """Downsampled location history: one row per driver per time bucket (see retention.py)."""
+    __table_args__ = (
+        db.UniqueConstraint('driver_id', 'bucket', name='uq_location_rollup_driver_bucket'),
+        db.Index('ix_location_rollup_bucket', 'bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    driver_id = db.Column(db.String(50), nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False)  # start of the bucket (UTC)
+    latitude = db.Column(db.Float, nullable=False)  # mean of the fixes in the bucket
+    longitude = db.Column(db.Float, nullable=False)
+    accuracy = db.Column(db.Float, nullable=True)  # best (smallest) reported accuracy
+    samples = db.Column(db.Integer, nullable=False)
+
+    def to_dict(self):
+        return {
+            'driver_id': self.driver_id,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'accuracy': self.accuracy,
+            'samples': self.samples,
+            'timestamp': self.bucket.isoformat() + 'Z',
+        }
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
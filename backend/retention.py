@@ -0,0 +1,184 @@
+"""
+Retention for the location history.
+
+Raw fixes are kept for `raw_days`. Older fixes are rolled up into
+LocationRollup rows (one per driver per `bucket_seconds`: the mean position,
+the best accuracy and the number of fixes) and deleted in the same
+transaction, so a fix is always either raw or counted in exactly one rollup.
+Rollups older than `rollup_days` are purged (0 keeps them forever).
+
+All of it runs on a background thread in short transactions of `batch_size`
+rows with a pause in between, so the ingest writer never waits long for the
+database.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+
+from models import Location, LocationRollup
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class LocationRetention:
+    """Periodic roll-up and purge of old Location rows.
+
+    engine: SQLAlchemy engine (db.engine).
+    batch_size: rows per transaction; kept under SQLite's 999 bound parameters.
+    interval: seconds between passes; pause: seconds between batches.
+    """
+
+    def __init__(self, engine, raw_days=7.0, bucket_seconds=60, rollup_days=365.0, batch_size=500,
+                 interval=600.0, pause=0.05):
+        self.engine = engine
+        self.raw_days = raw_days
+        self.bucket_seconds = max(1, int(bucket_seconds))
+        self.rollup_days = rollup_days
+        self.batch_size = max(1, min(int(batch_size), 900))
+        self.interval = interval
+        self.pause = pause
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.passes = 0
+        self.rolled_up = 0
+        self.rollups_written = 0
+        self.rollups_purged = 0
+        self.last_pass_ms = 0.0
+        self.last_error = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='location-retention', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            'passes': self.passes,
+            'rolled_up': self.rolled_up,
+            'rollups_written': self.rollups_written,
+            'rollups_purged': self.rollups_purged,
+            'last_pass_ms': self.last_pass_ms,
+            'last_error': self.last_error,
+        }
+
+    def _run(self):
+        # first pass shortly after startup, then every `interval` seconds
+        wait = min(60.0, self.interval)
+        while not self._stop.wait(wait):
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Location retention pass failed: {e}")
+            wait = self.interval
+
+    def _bucket(self, ts):
+        secs = int((ts - _EPOCH).total_seconds())
+        return _EPOCH + timedelta(seconds=secs - secs % self.bucket_seconds)
+
+    def run_once(self, now=None):
+        """Roll up and purge everything that is due; returns (raw rows rolled up, rollups purged)."""
+        t0 = time.perf_counter()
+        now = now or datetime.utcnow()
+        # bucket-aligned, so a bucket is never split between raw and rolled-up data
+        cutoff = self._bucket(now - timedelta(days=self.raw_days))
+        rolled = 0
+        while not self._stop.is_set():
+            n = self._roll_up_batch(cutoff)
+            rolled += n
+            if n < self.batch_size:
+                break
+            time.sleep(self.pause)
+        purged = 0
+        if self.rollup_days:
+            old = now - timedelta(days=self.rollup_days)
+            while not self._stop.is_set():
+                n = self._purge_rollups_batch(old)
+                purged += n
+                if n < self.batch_size:
+                    break
+                time.sleep(self.pause)
+        self.passes += 1
+        self.last_pass_ms = (time.perf_counter() - t0) * 1000.0
+        return rolled, purged
+
+    def _roll_up_batch(self, cutoff):
+        loc = Location.__table__
+        with self.engine.begin() as conn:
+            rows = conn.execute(
+                select(loc.c.id, loc.c.driver_id, loc.c.timestamp, loc.c.latitude, loc.c.longitude, loc.c.accuracy)
+                .where(loc.c.timestamp < cutoff)
+                .order_by(loc.c.timestamp)
+                .limit(self.batch_size)
+            ).all()
+            if not rows:
+                return 0
+            buckets = {}
+            for r in rows:
+                key = (r.driver_id, self._bucket(r.timestamp))
+                b = buckets.get(key)
+                if b is None:
+                    buckets[key] = [1, r.latitude, r.longitude, r.accuracy]
+                    continue
+                b[0] += 1
+                b[1] += r.latitude
+                b[2] += r.longitude
+                if r.accuracy is not None and (b[3] is None or r.accuracy < b[3]):
+                    b[3] = r.accuracy
+            self._merge(conn, buckets)
+            conn.execute(delete(loc).where(loc.c.id.in_([r.id for r in rows])))
+        self.rolled_up += len(rows)
+        return len(rows)
+
+    def _merge(self, conn, buckets):
+        """Add {(driver_id, bucket): [n, sum_lat, sum_lon, best_acc]} to the rollup table."""
+        roll = LocationRollup.__table__
+        starts = [k[1] for k in buckets]
+        existing = conn.execute(
+            select(roll.c.id, roll.c.driver_id, roll.c.bucket, roll.c.latitude, roll.c.longitude,
+                   roll.c.accuracy, roll.c.samples)
+            .where(roll.c.driver_id.in_(sorted({k[0] for k in buckets})))
+            .where(roll.c.bucket.between(min(starts), max(starts)))
+        ).all()
+        for r in existing:
+            b = buckets.pop((r.driver_id, r.bucket), None)
+            if b is None:
+                continue
+            n = r.samples + b[0]
+            acc = r.accuracy if b[3] is None else (b[3] if r.accuracy is None else min(r.accuracy, b[3]))
+            conn.execute(update(roll).where(roll.c.id == r.id).values(
+                latitude=(r.latitude * r.samples + b[1]) / n,
+                longitude=(r.longitude * r.samples + b[2]) / n,
+                accuracy=acc,
+                samples=n,
+            ))
+            self.rollups_written += 1
+        if buckets:
+            conn.execute(insert(roll), [
+                {'driver_id': driver_id, 'bucket': start, 'latitude': b[1] / b[0], 'longitude': b[2] / b[0],
+                 'accuracy': b[3], 'samples': b[0]}
+                for (driver_id, start), b in buckets.items()
+            ])
+            self.rollups_written += len(buckets)
+
+    def _purge_rollups_batch(self, older_than):
+        roll = LocationRollup.__table__
+        with self.engine.begin() as conn:
+            ids = conn.execute(
+                select(roll.c.id).where(roll.c.bucket < older_than).limit(self.batch_size)
+            ).scalars().all()
+            if ids:
+                conn.execute(delete(roll).where(roll.c.id.in_(ids)))
+        self.rollups_purged += len(ids)
+        return len(ids)
@@ -242,7 +242,7 @@ socket.on('drowsiness_alert', data => {
     const lon = parseFloat(data.longitude);
     if (Number.isFinite(lat) && Number.isFinite(lon) && !(data.location_unknown) && !(lat === 0 && lon === 0)) {
       const am = L.marker([lat, lon], { icon: createAlertIcon() }).addTo(alertLayer);
-      const pretty = `<div style="min-width:220px"><b>${data.driver_id}</b><br/><em>${data.status || ''}</em><br/><small>${data.timestamp ? new Date(data.timestamp).toLocaleString() : ''}</small><br/>${lat.toFixed(6)}, ${lon.toFixed(6)}${data.nearest_toll ? ('<br/><small>Nearest: ' + data.nearest_toll.name + '</small>') : ''}<pre style="white-space:pre-wrap;word-break:break-word;font-size:11px;margin-top:6px">${JSON.stringify(data.details || {}, null, 2)}</pre></div>`;
+      const pretty = `<div style="min-width:220px"><b>${data.driver_id}</b><br/><em>${data.status || ''}</em><br/><small>${data.timestamp ? new Date(data.timestamp).toLocaleString() : ''}</small><br/>${lat.toFixed(6)}, ${lon.toFixed(6)}${data.nearest_toll ? ('<br/><small>Nearest: ' + data.nearest_toll.name + '</small>') : ''}${data.perclos != null ? ('<br/><small>PERCLOS ' + (data.perclos * 100).toFixed(0) + '%, ' + (data.blinks_per_min ?? 0) + ' blinks/min</small>') : ''}<pre style="white-space:pre-wrap;word-break:break-word;font-size:11px;margin-top:6px">${JSON.stringify(data.details || {}, null, 2)}</pre></div>`;
       am.bindPopup(pretty);
       // briefly open popup to draw attention
       try { am.openPopup(); setTimeout(() => am.closePopup(), 2200); } catch (e) { }
@@ -2,13 +2,17 @@ from __future__ import annotations
 
 import math
 
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
 
 def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Compute the great-circle distance between two points on Earth in kilometers.
 
     Uses the Haversine formula. Assumes a spherical Earth with radius 6371 km.
     """
-    r = 6371.0
+    r = EARTH_RADIUS_KM
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
     d_phi = math.radians(lat2 - lat1)
@@ -19,3 +23,113 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return r * c
 
 
+def _haversine(phi1, lam1, phi2, lam2, cos_phi1, cos_phi2):
+    a = np.sin((phi2 - phi1) / 2) ** 2 + cos_phi1 * cos_phi2 * np.sin((lam2 - lam1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_km_many(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Distances in km from one point to every point in the `lats`/`lons` arrays."""
+    phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lam2 = np.radians(np.asarray(lons, dtype=np.float64))
+    phi1 = math.radians(lat)
+    return _haversine(phi1, math.radians(lon), phi2, lam2, math.cos(phi1), np.cos(phi2))
+
+
+def haversine_km_pairwise(lats1, lons1, lats2, lons2) -> np.ndarray:
+    """(len(lats1), len(lats2)) matrix of distances in km between two sets of points."""
+    phi1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    lam1 = np.radians(np.asarray(lons1, dtype=np.float64))[:, None]
+    phi2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    lam2 = np.radians(np.asarray(lons2, dtype=np.float64))[None, :]
+    return _haversine(phi1, lam1, phi2, lam2, np.cos(phi1), np.cos(phi2))
+
+
+def equirectangular_km(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Flat-earth approximation of haversine_km_many for short ranges.
+
+    Projects onto a plane scaled by the cosine of the mean latitude. Below 100 km
+    and away from the poles (|lat| < 70) it stays within 0.01 % of the haversine
+    distance (see benchmarks/bench_geo.py); use it to rank or filter nearby
+    points, not for long distances.
+    """
+    phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+    d_lam = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+    if d_lam.size and np.abs(d_lam).max() > math.pi:
+        # across the antimeridian
+        d_lam = (d_lam + math.pi) % (2 * math.pi) - math.pi
+    phi1 = math.radians(lat)
+    x = d_lam * np.cos((phi2 + phi1) * 0.5)
+    y = phi2 - phi1
+    return EARTH_RADIUS_KM * np.sqrt(x * x + y * y)
+
+
+def initial_bearing_deg(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Initial great-circle bearing from point 1 to point 2 in degrees (0 = north, clockwise).
+
+    Arguments broadcast, so one origin against arrays of targets works too.
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    d_lam = np.radians(np.subtract(lon2, lon1))
+    y = np.sin(d_lam) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(d_lam)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def destination_point(lat, lon, bearing_deg, distance_km):
+    """(lat, lon) reached by travelling distance_km from a point along bearing_deg.
+
+    Arguments broadcast; longitudes come back in [-180, 180).
+    """
+    phi1 = np.radians(lat)
+    theta = np.radians(bearing_deg)
+    delta = np.asarray(distance_km, dtype=np.float64) / EARTH_RADIUS_KM
+    sin_phi2 = np.sin(phi1) * np.cos(delta) + np.cos(phi1) * np.sin(delta) * np.cos(theta)
+    phi2 = np.arcsin(np.clip(sin_phi2, -1.0, 1.0))
+    lam2 = np.radians(lon) + np.arctan2(np.sin(theta) * np.sin(delta) * np.cos(phi1),
+                                        np.cos(delta) - np.sin(phi1) * sin_phi2)
+    return np.degrees(phi2), (np.degrees(lam2) + 180.0) % 360.0 - 180.0
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    """(lat_min, lat_max, lon_min, lon_max) enclosing every point within radius_km.
+
+    lon_min > lon_max when the box crosses the antimeridian; a box that reaches
+    a pole spans all longitudes.
+    """
+    delta = radius_km / EARTH_RADIUS_KM
+    d_lat = math.degrees(delta)
+    lat_min, lat_max = lat - d_lat, lat + d_lat
+    if lat_min <= -90.0 or lat_max >= 90.0:
+        return max(lat_min, -90.0), min(lat_max, 90.0), -180.0, 180.0
+    d_lon = math.degrees(math.asin(math.sin(delta) / math.cos(math.radians(lat))))
+    lon_min = (lon - d_lon + 180.0) % 360.0 - 180.0
+    lon_max = (lon + d_lon + 180.0) % 360.0 - 180.0
+    return lat_min, lat_max, lon_min, lon_max
+
+
+def in_bounding_box(lats, lons, box) -> np.ndarray:
+    """Boolean mask of the points inside a box from bounding_box()."""
+    lat_min, lat_max, lon_min, lon_max = box
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    mask = (lats >= lat_min) & (lats <= lat_max)
+    if lon_min <= lon_max:
+        return mask & (lons >= lon_min) & (lons <= lon_max)
+    return mask & ((lons >= lon_min) | (lons <= lon_max))
+
+
+def within_radius(lat: float, lon: float, lats, lons, radius_km: float) -> tuple[np.ndarray, np.ndarray]:
+    """Indices and distances (closest first) of the points within radius_km.
+
+    A bounding-box comparison discards most points before any trigonometry runs.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    idx = np.flatnonzero(in_bounding_box(lats, lons, bounding_box(lat, lon, radius_km)))
+    dist = haversine_km_many(lat, lon, lats[idx], lons[idx])
+    keep = dist <= radius_km
+    idx, dist = idx[keep], dist[keep]
+    order = np.argsort(dist, kind='stable')
+    return idx[order], dist[order]
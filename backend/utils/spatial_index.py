@@ -0,0 +1,197 @@
+"""
+In-memory spatial index of tollbooths for the alert path.
+
+Booths are kept as unit vectors on the sphere (so distances are exact
+great-circle distances, with no trouble at the date line) and bucketed into a
+latitude/longitude grid. A query scans the grid in rings around the query
+cell and stops as soon as nothing outside the scanned rings can be closer
+than what was already found; if that takes more than `max_rings` rings
+(booths far away, or a large radius) it falls back to one vectorised pass
+over every booth, which is still well under a millisecond at 100k booths.
+
+The index is filled once from the database and then kept current with add(),
+so an alert never has to read the tollbooth table.
+"""
+from __future__ import annotations
+
+import math
+import threading
+
+import numpy as np
+
+from .distance import EARTH_RADIUS_KM
+
+
+def _unit(lat, lon):
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+class TollboothIndex:
+    """Nearest, k-nearest and radius queries over tollbooths.
+
+    cell_deg: grid cell size in degrees (0.25 is about 28 km north-south).
+    max_rings: rings of cells scanned before switching to a full vectorised scan.
+    Every booth carries an `info` dict that queries hand back unchanged.
+    """
+
+    def __init__(self, cell_deg=0.25, max_rings=6, capacity=1024):
+        self.rows = max(1, int(round(180.0 / cell_deg)))
+        self.cols = max(1, int(round(360.0 / cell_deg)))
+        self.lat_step = 180.0 / self.rows
+        self.lon_step = 360.0 / self.cols
+        self.max_rings = max_rings
+        self._capacity = max(1, int(capacity))
+        self._xyz = np.empty((self._capacity, 3))
+        self._info = []
+        self._slot_cell = []
+        self._cells = {}
+        self._ids = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.queries = 0
+        self.full_scans = 0
+
+    def __len__(self):
+        return len(self._info)
+
+    def _cell(self, lat, lon):
+        row = min(self.rows - 1, max(0, int((lat + 90.0) // self.lat_step)))
+        col = int((lon + 180.0) // self.lon_step) % self.cols
+        return row, col
+
+    def load(self, booths):
+        """Replace the contents with `booths`: an iterable of (id, lat, lon, info)."""
+        with self._lock:
+            self._xyz = np.empty((self._capacity, 3))
+            self._info = []
+            self._slot_cell = []
+            self._cells = {}
+            self._ids = {}
+            for booth_id, lat, lon, info in booths:
+                self._add(booth_id, lat, lon, info)
+            self.loaded = True
+
+    def add(self, booth_id, lat, lon, info):
+        """Add one booth (or move it, if `booth_id` is already indexed)."""
+        with self._lock:
+            self._add(booth_id, lat, lon, info)
+
+    def _add(self, booth_id, lat, lon, info):
+        lat, lon = float(lat), float(lon)
+        cell = self._cell(lat, lon)
+        slot = self._ids.get(booth_id)
+        if slot is not None:
+            # re-registered: move it out of its old cell and reuse the slot
+            self._cells[self._slot_cell[slot]].remove(slot)
+            self._info[slot] = info
+            self._slot_cell[slot] = cell
+        else:
+            slot = len(self._info)
+            if slot == len(self._xyz):
+                self._xyz = np.concatenate([self._xyz, np.empty_like(self._xyz)])
+            self._info.append(info)
+            self._slot_cell.append(cell)
+            self._ids[booth_id] = slot
+        self._xyz[slot] = _unit(lat, lon)
+        self._cells.setdefault(cell, []).append(slot)
+
+    # --- queries ---
+
+    def nearest(self, lat, lon, max_km=None):
+        """(info, distance_km) of the closest booth, or None."""
+        found = self.k_nearest(lat, lon, 1, max_km)
+        return found[0] if found else None
+
+    def k_nearest(self, lat, lon, k, max_km=None):
+        """Up to k (info, distance_km) pairs, closest first."""
+        if k <= 0:
+            return []
+        with self._lock:
+            self.queries += 1
+            if not self._info:
+                return []
+            q = np.array(_unit(lat, lon))
+            slots, dists = self._search(lat, lon, q, k=k)
+            order = np.argsort(dists, kind='stable')[:k]
+            out = [(self._info[slots[i]], float(dists[i])) for i in order]
+        if max_km is not None:
+            out = [item for item in out if item[1] <= max_km]
+        return out
+
+    def within(self, lat, lon, radius_km):
+        """Every (info, distance_km) with distance <= radius_km, closest first."""
+        with self._lock:
+            self.queries += 1
+            if not self._info:
+                return []
+            q = np.array(_unit(lat, lon))
+            slots, dists = self._search(lat, lon, q, radius_km=radius_km)
+            keep = np.flatnonzero(dists <= radius_km)
+            keep = keep[np.argsort(dists[keep], kind='stable')]
+            return [(self._info[slots[i]], float(dists[i])) for i in keep]
+
+    def stats(self):
+        return {'booths': len(self._info), 'cells': len(self._cells),
+                'queries': self.queries, 'full_scans': self.full_scans}
+
+    def _distances(self, slots, q):
+        chord = np.sqrt(((self._xyz[slots] - q) ** 2).sum(axis=1))
+        return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, chord / 2.0))
+
+    def _search(self, lat, lon, q, k=None, radius_km=None):
+        """Candidate (slots, distances) that contain the answer for k or radius_km."""
+        row, col = self._cell(lat, lon)
+        found = []
+        dists = np.empty(0)
+        for r in range(self.max_rings + 1):
+            ring = []
+            for dr in range(-r, r + 1):
+                rr = row + dr
+                if rr < 0 or rr >= self.rows:
+                    continue
+                step = 1 if abs(dr) == r else 2 * r
+                for dc in range(-r, r + 1, max(1, step)):
+                    members = self._cells.get((rr, (col + dc) % self.cols))
+                    if members:
+                        ring.extend(members)
+            if ring:
+                found.extend(ring)
+                dists = np.concatenate([dists, self._distances(ring, q)])
+            bound = self._ring_bound(lat, lon, row, col, r)
+            if radius_km is not None:
+                if bound >= radius_km:
+                    return found, dists
+            elif len(found) >= k and np.partition(dists, k - 1)[k - 1] <= bound:
+                return found, dists
+            if bound == math.inf:
+                return found, dists
+        # far away or a large radius: one pass over everything
+        self.full_scans += 1
+        n = len(self._info)
+        cos_d = self._xyz[:n] @ q
+        if radius_km is not None:
+            # slack so rounding cannot drop a booth on the boundary; within() filters exactly
+            slots = np.flatnonzero(cos_d >= math.cos(min(math.pi, radius_km / EARTH_RADIUS_KM)) - 1e-9)
+        else:
+            k = min(k, n)
+            slots = np.argpartition(-cos_d, k - 1)[:k]
+        return slots, self._distances(slots, q)
+
+    def _ring_bound(self, lat, lon, row, col, r):
+        """Lower bound (km) on the distance to any booth outside rings 0..r."""
+        bound = math.inf
+        if row - r > 0:
+            south = (row - r) * self.lat_step - 90.0
+            bound = min(bound, math.radians(lat - south) * EARTH_RADIUS_KM)
+        if row + r < self.rows - 1:
+            north = (row + r + 1) * self.lat_step - 90.0
+            bound = min(bound, math.radians(north - lat) * EARTH_RADIUS_KM)
+        if 2 * r + 1 < self.cols:
+            west = (col - r) * self.lon_step - 180.0
+            east = (col + r + 1) * self.lon_step - 180.0
+            x = (lon + 180.0) % 360.0 - 180.0
+            d_lon = math.radians(min(x - west, east - x, 90.0))
+            # closest approach to a meridian d_lon away from a point at this latitude
+            bound = min(bound, math.asin(min(1.0, math.cos(math.radians(lat)) * math.sin(d_lon))) * EARTH_RADIUS_KM)
+        return bound
@@ -0,0 +1,91 @@
+"""
+Simulation: alert timing of detection_engine at low frame rates.
+
+Drives DriverSelector, LandmarkSampler and AlertState with a scripted drive
+(eyes closed for a while, two yawns a few seconds apart, a short closed-eye
+glimpse on both sides of a face dropout) at several frame rates, and reports
+when each alert fires. Drowsiness should fire closed_seconds after the eyes
+close at every rate, both yawns should alert (the re-arm works even when the
+sampler skips frames), and the dropout must not raise anything. Any delay beyond one frame comes
+from the landmark sampler: while the face is calm it samples one frame in
+--landmark-every, so at very low rates the first closed (or open-mouth)
+sample can be late, or a short yawn can be missed.
+
+Usage: python benchmarks/bench_alert_timing.py [--fps 1.5,3,5,8,15,30] [--landmark-every 3]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from detection_engine import EYE_AR_CONSEC_SECONDS, DriverSelector, LandmarkSampler  # noqa: E402
+
+FACE = (100, 80, 120, 120)
+# (start, end, eyes closed, mouth open, face visible)
+SCRIPT = (
+    (0.0, 10.0, False, False, True),
+    (10.0, 14.0, True, False, True),     # drowsiness expected at 10 + closed_seconds
+    (14.0, 20.0, False, False, True),
+    (20.0, 22.0, False, True, True),     # first yawn
+    (22.0, 27.0, False, False, True),
+    (27.0, 29.0, False, True, True),     # second yawn, after re-arm
+    (29.0, 34.5, False, False, True),
+    (34.5, 35.0, True, False, True),     # closed just before the face is lost ...
+    (35.0, 36.25, True, False, False),
+    (36.25, 36.75, True, False, True),   # ... and just after: no alert expected
+    (36.75, 45.0, False, False, True),
+)
+
+
+def state_at(t):
+    for start, end, closed, yawn, visible in SCRIPT:
+        if start <= t < end:
+            return closed, yawn, visible
+    return False, False, True
+
+
+def simulate(fps, landmark_every, extra_faces):
+    selector = DriverSelector(extra_faces)
+    sampler = LandmarkSampler(landmark_every)
+    alerts = []
+    frame = 0
+    while frame / fps < SCRIPT[-1][1]:
+        t = frame / fps
+        frame += 1
+        closed, yawn, visible = state_at(t)
+        rects = ([FACE] if visible else []) + [(300, 90, 80, 80)] * extra_faces
+        faces = selector.update(rects, (360, 450))
+        sampler.begin_frame(selector.visible_ids())
+        for face in faces:
+            if not sampler.due(face.id):
+                continue
+            driver = face.rect == FACE
+            ear = 0.2 if closed and driver else 0.35
+            lip = 30.0 if yawn and driver else 5.0
+            sampler.record(face.id, ear, lip)
+            for kind in face.alert.update(ear, lip, t):
+                if face is selector.primary:
+                    alerts.append((kind, t))
+    return alerts
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--fps', default='1.5,3,5,8,15,30')
+    ap.add_argument('--landmark-every', type=int, default=3)
+    ap.add_argument('--extra-faces', type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"{'fps':>5} {'drowsy at':>9} {'expected':>8} {'yawns at':>14} {'after dropout':>13}")
+    for fps in (float(v) for v in args.fps.split(',')):
+        alerts = simulate(fps, args.landmark_every, args.extra_faces)
+        drowsy = [t for kind, t in alerts if kind == 'drowsiness' and t < 30.0]
+        yawns = [t for kind, t in alerts if kind == 'yawn']
+        late = [f"{kind}@{t:.2f}" for kind, t in alerts if t >= 34.5]
+        print(f"{fps:5.1f} {drowsy[0] if drowsy else float('nan'):9.2f} {10.0 + EYE_AR_CONSEC_SECONDS:8.2f} "
+              f"{', '.join(f'{t:.2f}' for t in yawns) or '-':>14} {', '.join(late) or 'none':>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: face detector backends on the same recorded clips.
+
+Every backend sees the same frames (resized to the processing width, gray),
+and the report lists throughput, per-frame latency and recall. Recall is
+measured against a reference backend (dlib HOG with one upsampling pass by
+default): a reference face counts as found when a backend box overlaps it
+with IoU >= --min-iou.
+
+Usage: python benchmarks/bench_detectors.py clip.mp4 [frames_dir ...]
+           [--backends haar,hog,roi] [--width 450] [--max-frames 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from face_detectors import BACKENDS, DlibHogDetector, create_detector  # noqa: E402
+from face_tracking import iou  # noqa: E402
+from replay import iter_frames  # noqa: E402
+
+
+def load_frames(paths, width, max_frames, fps):
+    frames = []
+    for path in paths:
+        for _, frame in iter_frames(path, fps=fps):
+            h, w = frame.shape[:2]
+            if w != width:
+                frame = cv2.resize(frame, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+            if max_frames and len(frames) >= max_frames:
+                return frames
+    return frames
+
+
+def run_backend(detector, frames):
+    boxes = []
+    times = []
+    for gray in frames:
+        t0 = time.perf_counter()
+        boxes.append(detector.detect(gray))
+        times.append(time.perf_counter() - t0)
+    return boxes, times
+
+
+def recall(found, reference, min_iou):
+    hits = total = 0
+    for got, ref in zip(found, reference):
+        total += len(ref)
+        hits += sum(1 for r in ref if any(iou(r, g) >= min_iou for g in got))
+    return hits / total if total else 0.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('clips', nargs='+', help='video files or directories of frames')
+    ap.add_argument('--backends', default=','.join(BACKENDS))
+    ap.add_argument('--reference-upsample', type=int, default=1,
+                    help='upsampling passes for the dlib HOG reference detector')
+    ap.add_argument('--width', type=int, default=450)
+    ap.add_argument('--max-frames', type=int, default=500)
+    ap.add_argument('--fps', type=float, default=30.0, help='frame rate assumed for frame directories')
+    ap.add_argument('--min-iou', type=float, default=0.3)
+    args = ap.parse_args()
+
+    frames = load_frames(args.clips, args.width, args.max_frames, args.fps)
+    if not frames:
+        sys.exit('no frames could be read')
+    reference, _ = run_backend(DlibHogDetector(upsample=args.reference_upsample), frames)
+    ref_faces = sum(len(r) for r in reference)
+    print(f"frames: {len(frames)} at width {args.width}, reference faces: {ref_faces}")
+    print(f"{'backend':8} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'recall':>7} {'faces/frame':>12}")
+    for name in args.backends.split(','):
+        boxes, times = run_backend(create_detector(name.strip()), frames)
+        ordered = sorted(times)
+        n = len(ordered)
+        print(f"{name:8} {n / sum(times):8.1f} {ordered[n // 2] * 1000:8.2f} "
+              f"{ordered[min(n - 1, int(n * 0.95))] * 1000:8.2f} {ordered[-1] * 1000:8.2f} "
+              f"{recall(boxes, reference, args.min_iou):7.1%} {sum(len(b) for b in boxes) / n:12.2f}")
+
+
+if __name__ == '__main__':
+    main()
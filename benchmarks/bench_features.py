@@ -0,0 +1,85 @@
+"""
+Micro-benchmark: features.FaceFeatures vs. the per-frame EAR / lip functions
+that used to live in drowsiness_yawn.py and detect.py.
+
+Usage: python benchmarks/bench_features.py [--frames 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.spatial import distance as dist
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from features import FaceFeatures  # noqa: E402
+
+
+# --- reference implementation (as previously copied into both detectors) ---
+def eye_aspect_ratio(eye):
+    A = dist.euclidean(eye[1], eye[5])
+    B = dist.euclidean(eye[2], eye[4])
+    C = dist.euclidean(eye[0], eye[3])
+    ear = (A + B) / (2.0 * C)
+    return ear
+
+
+def final_ear(shape):
+    leftEye = shape[42:48]
+    rightEye = shape[36:42]
+    leftEAR = eye_aspect_ratio(leftEye)
+    rightEAR = eye_aspect_ratio(rightEye)
+    ear = (leftEAR + rightEAR) / 2.0
+    return (ear, leftEye, rightEye)
+
+
+def lip_distance(shape):
+    top_lip = shape[50:53]
+    top_lip = np.concatenate((top_lip, shape[61:64]))
+    low_lip = shape[56:59]
+    low_lip = np.concatenate((low_lip, shape[65:68]))
+    top_mean = np.mean(top_lip, axis=0)
+    low_mean = np.mean(low_lip, axis=0)
+    distance = abs(top_mean[1] - low_mean[1])
+    return distance
+
+
+def _timeit(fn, shapes):
+    t0 = time.perf_counter()
+    for s in shapes:
+        fn(s)
+    return (time.perf_counter() - t0) / len(shapes) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--frames', type=int, default=20000)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    # integer landmarks, like face_utils.shape_to_np returns
+    shapes = rng.integers(50, 400, size=(args.frames, 68, 2))
+    feats = FaceFeatures()
+
+    # correctness check against the reference
+    for s in shapes[:200]:
+        _, _, ear, lip = feats(s)
+        assert abs(ear - final_ear(s)[0]) < 1e-9
+        assert abs(lip - lip_distance(s)) < 1e-9
+
+    ref_us = _timeit(lambda s: (final_ear(s), lip_distance(s)), shapes)
+    new_us = _timeit(feats, shapes)
+    t0 = time.perf_counter()
+    feats.batch(shapes)
+    batch_us = (time.perf_counter() - t0) / len(shapes) * 1e6
+
+    print(f"frames: {args.frames}")
+    print(f"reference (scipy + concatenate): {ref_us:8.2f} us/frame")
+    print(f"FaceFeatures single frame:       {new_us:8.2f} us/frame  (x{ref_us / new_us:.1f})")
+    print(f"FaceFeatures.batch:              {batch_us:8.2f} us/frame  (x{ref_us / batch_us:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: backend/utils/distance.py vectorised helpers against the scalar
+haversine_km called in a Python loop.
+
+Reports one-to-many and pairwise haversine, the equirectangular approximation
+(with its worst relative error below --short-km), and radius queries with and
+without the bounding-box prefilter, over random points in a country-sized box.
+
+Usage: python benchmarks/bench_geo.py [--points 1000,100000] [--radius-km 25]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from backend.utils.distance import (  # noqa: E402
+    destination_point, equirectangular_km, haversine_km, haversine_km_many, haversine_km_pairwise,
+    initial_bearing_deg, within_radius)
+
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--points', default='1000,100000')
+    ap.add_argument('--pairwise', type=int, default=1000, help='points per side for the pairwise matrix')
+    ap.add_argument('--radius-km', type=float, default=25.0)
+    ap.add_argument('--short-km', type=float, default=100.0, help='range for the equirectangular error check')
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    lat0, lon0 = 21.0, 78.0
+    print(f"{'points':>7} {'scalar ms':>10} {'many ms':>8} {'equirect ms':>12} {'radius ms':>10} "
+          f"{'radius+bbox ms':>15} {'speedup':>8}")
+    for n in (int(v) for v in args.points.split(',')):
+        lats = rng.uniform(8.0, 35.0, n)
+        lons = rng.uniform(68.0, 97.0, n)
+        lat_list, lon_list = lats.tolist(), lons.tolist()
+        scalar = best_of(lambda: [haversine_km(lat0, lon0, a, b) for a, b in zip(lat_list, lon_list)], 3)
+        many = best_of(lambda: haversine_km_many(lat0, lon0, lats, lons))
+        equi = best_of(lambda: equirectangular_km(lat0, lon0, lats, lons))
+        plain = best_of(lambda: np.flatnonzero(haversine_km_many(lat0, lon0, lats, lons) <= args.radius_km))
+        boxed = best_of(lambda: within_radius(lat0, lon0, lats, lons, args.radius_km))
+        ref = np.array([haversine_km(lat0, lon0, a, b) for a, b in zip(lat_list, lon_list)])
+        assert np.allclose(ref, haversine_km_many(lat0, lon0, lats, lons), atol=1e-6)
+        assert set(within_radius(lat0, lon0, lats, lons, args.radius_km)[0]) == set(np.flatnonzero(ref <= args.radius_km))
+        print(f"{n:7d} {scalar * 1e3:10.2f} {many * 1e3:8.3f} {equi * 1e3:12.3f} {plain * 1e3:10.3f} "
+              f"{boxed * 1e3:15.3f} {scalar / many:7.0f}x")
+
+    m = args.pairwise
+    a_lat, a_lon = rng.uniform(8.0, 35.0, m), rng.uniform(68.0, 97.0, m)
+    a_lat_l, a_lon_l = a_lat.tolist(), a_lon.tolist()
+    rows = max(1, m // 20)
+    scalar = best_of(lambda: [[haversine_km(a_lat_l[i], a_lon_l[i], b, c) for b, c in zip(a_lat_l, a_lon_l)]
+                              for i in range(rows)], 3) * (m / rows)
+    pair = best_of(lambda: haversine_km_pairwise(a_lat, a_lon, a_lat, a_lon))
+    print(f"pairwise {m}x{m}: scalar {scalar * 1e3:.0f} ms (extrapolated), vectorised {pair * 1e3:.1f} ms "
+          f"({scalar / pair:.0f}x)")
+
+    # equirectangular error for short hops from many origins, away from the poles
+    worst = 0.0
+    bearing_err = 0.0
+    for _ in range(200):
+        start_lat, start_lon = rng.uniform(-69.0, 69.0), rng.uniform(-180.0, 180.0)
+        bearing = rng.uniform(0.0, 360.0, 1000)
+        end_lat, end_lon = destination_point(start_lat, start_lon, bearing, rng.uniform(0.01, args.short_km, 1000))
+        h = haversine_km_many(start_lat, start_lon, end_lat, end_lon)
+        e = equirectangular_km(start_lat, start_lon, end_lat, end_lon)
+        worst = max(worst, float(np.max(np.abs(e - h) / h)))
+        back = initial_bearing_deg(start_lat, start_lon, end_lat, end_lon)
+        bearing_err = max(bearing_err, float(np.max(np.abs((back - bearing + 180.0) % 360.0 - 180.0))))
+    print(f"equirectangular worst relative error below {args.short_km:.0f} km (|lat| < 70): {worst:.2e}; "
+          f"bearing/destination round trip max error {bearing_err:.1e} deg")
+
+
+if __name__ == '__main__':
+    main()
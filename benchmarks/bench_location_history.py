@@ -0,0 +1,91 @@
+"""
+Benchmark: "last 100 fixes for a driver" (the /api/locations query) as the
+location table grows, with and without the (driver_id, timestamp) index.
+
+Uses the same table layout SQLAlchemy creates for backend/models.Location,
+through the standard sqlite3 module. Rows are appended in time order for a
+fleet of drivers, and after each growth step the query is timed for random
+drivers.
+
+Usage: python benchmarks/bench_location_history.py [--steps 100000,400000,1600000] [--drivers 200]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE location (
+    id INTEGER NOT NULL PRIMARY KEY,
+    driver_id VARCHAR(50) NOT NULL,
+    latitude FLOAT NOT NULL,
+    longitude FLOAT NOT NULL,
+    accuracy FLOAT,
+    timestamp DATETIME NOT NULL
+)
+"""
+INDEXES = """
+CREATE INDEX ix_location_driver_timestamp ON location (driver_id, timestamp);
+CREATE INDEX ix_location_timestamp ON location (timestamp);
+"""
+QUERY = "SELECT * FROM location WHERE driver_id = ? ORDER BY timestamp DESC LIMIT 100"
+
+
+def grow(conn, start, count, drivers, t0):
+    rows = []
+    for i in range(start, start + count):
+        ts = t0 + timedelta(seconds=i // drivers)
+        rows.append((f"driver{i % drivers}", 12.9 + i * 1e-7, 77.5, 10.0, ts.strftime('%Y-%m-%d %H:%M:%S.%f')))
+    conn.executemany("INSERT INTO location (driver_id, latitude, longitude, accuracy, timestamp) "
+                     "VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+
+def time_query(conn, drivers, n, rng):
+    times = []
+    for _ in range(n):
+        t = time.perf_counter()
+        conn.execute(QUERY, (f"driver{rng.randrange(drivers)}",)).fetchall()
+        times.append(time.perf_counter() - t)
+    times.sort()
+    return times[len(times) // 2] * 1000.0, times[int(len(times) * 0.95)] * 1000.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--steps', default='100000,400000,1600000', help='table sizes to measure at')
+    ap.add_argument('--drivers', type=int, default=200)
+    ap.add_argument('--queries', type=int, default=50)
+    args = ap.parse_args()
+
+    rng = random.Random(1)
+    t0 = datetime(2026, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        dbs = {}
+        for name, indexed in (('no index', False), ('indexed', True)):
+            conn = sqlite3.connect(os.path.join(tmp, f"{name.replace(' ', '_')}.db"))
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+            if indexed:
+                conn.executescript(INDEXES)
+            dbs[name] = conn
+        print(f"{'rows':>9} {'no index p50 ms':>16} {'p95':>8} {'indexed p50 ms':>15} {'p95':>8}")
+        size = 0
+        for target in (int(v) for v in args.steps.split(',')):
+            for conn in dbs.values():
+                grow(conn, size, target - size, args.drivers, t0)
+            size = target
+            plain = time_query(dbs['no index'], args.drivers, max(5, args.queries // 10), rng)
+            indexed = time_query(dbs['indexed'], args.drivers, args.queries, rng)
+            print(f"{size:9d} {plain[0]:16.2f} {plain[1]:8.2f} {indexed[0]:15.3f} {indexed[1]:8.3f}")
+        plan = dbs['indexed'].execute('EXPLAIN QUERY PLAN ' + QUERY, ('driver1',)).fetchall()
+        print('plan:', '; '.join(row[-1] for row in plan))
+        for conn in dbs.values():
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark: nmea.parse vs. the pynmea2 path _gps_serial_reader used to take
+(decode, strip, pynmea2.parse, read .latitude/.longitude).
+
+Usage: python benchmarks/bench_nmea.py [--sentences 50000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from nmea import LatestFix, log_lines, parse, run_reader  # noqa: E402
+
+
+def _sentence(body):
+    calc = 0
+    for c in body.encode('ascii'):
+        calc ^= c
+    return f"${body}*{calc:02X}\r\n".encode('ascii')
+
+
+def make_log(n):
+    """A 10 Hz receiver's output: GGA + RMC + two sentences we ignore per fix."""
+    lines = []
+    for i in range(n // 4):
+        t = 120000 + (i // 10) % 60 + (i % 10) / 10.0
+        lat = f"{1257.0 + i * 1e-4:.4f}"
+        lines.append(_sentence(f"GPGGA,{t:09.2f},{lat},N,07735.1234,E,1,08,0.9,920.0,M,-86.0,M,,"))
+        lines.append(_sentence(f"GPRMC,{t:09.2f},A,{lat},N,07735.1234,E,022.4,084.4,160926,003.1,W"))
+        lines.append(_sentence("GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1"))
+        lines.append(_sentence("GPGSV,2,1,08,01,40,083,46,02,17,308,41,12,07,344,39,14,22,228,45"))
+    return lines
+
+
+def old_path(line, pynmea2):
+    text = line.decode('ascii', errors='ignore').strip()
+    if not text.startswith('$'):
+        return None
+    try:
+        msg = pynmea2.parse(text)
+    except Exception:
+        return None
+    if hasattr(msg, 'latitude') and hasattr(msg, 'longitude'):
+        return float(msg.latitude), float(msg.longitude)
+    return None
+
+
+def _timeit(fn, lines):
+    t0 = time.perf_counter()
+    for line in lines:
+        fn(line)
+    return (time.perf_counter() - t0) / len(lines) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sentences', type=int, default=50000)
+    args = ap.parse_args()
+    lines = make_log(args.sentences)
+
+    new_us = _timeit(parse, lines)
+    print(f"sentences: {len(lines)}")
+    print(f"nmea.parse:              {new_us:8.2f} us/sentence")
+    try:
+        import pynmea2
+    except ImportError:
+        print("pynmea2 not installed; skipping the reference path")
+    else:
+        for line in lines[:100]:
+            ref, new = old_path(line, pynmea2), parse(line)
+            if new is not None:
+                assert abs(ref[0] - new[0]) < 1e-9 and abs(ref[1] - new[1]) < 1e-9
+        ref_us = _timeit(lambda line: old_path(line, pynmea2), lines)
+        print(f"decode + pynmea2.parse:  {ref_us:8.2f} us/sentence  (x{ref_us / new_us:.1f})")
+
+    with tempfile.NamedTemporaryFile('wb', suffix='.nmea', delete=False) as f:
+        f.writelines(lines)
+    try:
+        t0 = time.perf_counter()
+        stats = run_reader(log_lines(f.name, speed=0), LatestFix())
+        elapsed = time.perf_counter() - t0
+    finally:
+        os.unlink(f.name)
+    print(f"log replay (speed 0):    {stats['sentences'] / elapsed:8.0f} sentences/s, {stats['fixes']} fixes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark: LandmarkRecorder append cost and whole-recording analysis time.
+
+Records --hours of synthetic 30 fps samples into a temporary directory, then
+maps the files back and computes per-file EAR statistics and a closed-eye
+fraction the way an offline analysis would.
+
+Usage: python benchmarks/bench_recorder.py [--hours 2]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recorder import RECORD_DTYPE, LandmarkRecorder, open_recordings  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--hours', type=float, default=2.0)
+    ap.add_argument('--fps', type=float, default=30.0)
+    args = ap.parse_args()
+    n = int(args.hours * 3600 * args.fps)
+
+    rng = np.random.default_rng(0)
+    shape = rng.integers(50, 400, size=(68, 2))
+    ears = rng.normal(0.32, 0.04, size=n).astype(np.float32)
+    directory = tempfile.mkdtemp()
+    try:
+        rec = LandmarkRecorder(directory)
+        t0 = time.perf_counter()
+        for i in range(n):
+            rec.append(1.0 + i / args.fps, 1, True, ears[i], 12.0, shape)
+        append_s = time.perf_counter() - t0
+        rec.close()
+        size_mb = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 1e6
+
+        t0 = time.perf_counter()
+        parts = open_recordings(directory)
+        closed = sum(int(np.count_nonzero(p['ear'] < 0.3)) for p in parts)
+        mean = sum(float(p['ear'].sum(dtype=np.float64)) for p in parts) / n
+        analyse_s = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"records: {n} ({args.hours:g} h at {args.fps:g} fps), {RECORD_DTYPE.itemsize} bytes each, "
+          f"{len(parts)} file(s), {size_mb:.0f} MB")
+    print(f"append:  {append_s / n * 1e6:6.2f} us/record")
+    print(f"analyse: {analyse_s:6.2f} s (mean EAR {mean:.3f}, closed {closed / n:.1%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: per-frame transfer cost between processes, shm_ring.FrameRing vs.
+a plain multiprocessing.Queue carrying numpy frames.
+
+Both transports move every frame (the ring producer waits for the consumer
+instead of overwriting and the consumer reads each sequence number in turn)
+and the consumer touches each frame, so the numbers compare like for like.
+
+Usage: python benchmarks/bench_shm_ring.py [--frames 2000] [--width 450 --height 338]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from shm_ring import FrameRing  # noqa: E402
+
+
+def _queue_producer(q, frames, shape):
+    template = np.zeros(shape, dtype=np.uint8)
+    for i in range(frames):
+        # a camera hands out a new array per frame; Queue pickles it later on
+        # a feeder thread, so the same buffer must not be reused
+        frame = template.copy()
+        frame[0, 0, 0] = i % 255
+        q.put(frame)
+    q.put(None)
+
+
+def _ring_producer(spec, frames, shape, consumed):
+    ring = FrameRing.attach(spec)
+    template = np.zeros(shape, dtype=np.uint8)
+    for i in range(frames):
+        # flow control for the benchmark only: never lap the consumer
+        while i - consumed.value >= ring.slots - 1:
+            time.sleep(0)
+        frame = template.copy()
+        frame[0, 0, 0] = i % 255
+        ring.write(frame)
+    ring.close()
+
+
+def bench_queue(frames, shape):
+    ctx = mp.get_context()
+    q = ctx.Queue(maxsize=8)
+    p = ctx.Process(target=_queue_producer, args=(q, frames, shape), daemon=True)
+    t0 = time.perf_counter()
+    p.start()
+    checksum = 0
+    while True:
+        f = q.get()
+        if f is None:
+            break
+        checksum += int(f[0, 0, 0])
+    elapsed = time.perf_counter() - t0
+    p.join()
+    return elapsed / frames * 1e6, checksum
+
+
+def bench_ring(frames, shape):
+    ctx = mp.get_context()
+    ring = FrameRing(slots=4, max_shape=shape)
+    consumed = ctx.Value('q', -1, lock=False)
+    p = ctx.Process(target=_ring_producer, args=(ring.spec(), frames, shape, consumed), daemon=True)
+    t0 = time.perf_counter()
+    p.start()
+    checksum = 0
+    last = -1
+    while last < frames - 1:
+        item = ring.get(last + 1)
+        if item is None:
+            time.sleep(0)
+            continue
+        seq, _, f = item
+        checksum += int(f[0, 0, 0])
+        last = seq
+        consumed.value = seq
+    elapsed = time.perf_counter() - t0
+    p.join()
+    ring.close()
+    return elapsed / frames * 1e6, checksum
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--frames', type=int, default=2000)
+    ap.add_argument('--width', type=int, default=450)
+    ap.add_argument('--height', type=int, default=338)
+    args = ap.parse_args()
+    shape = (args.height, args.width, 3)
+
+    q_us, q_sum = bench_queue(args.frames, shape)
+    r_us, r_sum = bench_ring(args.frames, shape)
+    assert q_sum == r_sum
+
+    print(f"frames: {args.frames} of {args.width}x{args.height} BGR ({np.prod(shape) / 1024:.0f} KiB)")
+    print(f"multiprocessing.Queue: {q_us:8.1f} us/frame")
+    print(f"FrameRing (shm):       {r_us:8.1f} us/frame  (x{q_us / r_us:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: nearest-tollbooth lookup for /api/alert.
+
+Compares the linear loop receive_alert used to run over Tollbooth.query.all()
+with backend/utils/spatial_index.TollboothIndex for nearest, 5-nearest and
+radius queries, and checks that both give the same nearest booth. Booths are
+scattered along random "highways" across a country-sized box; half the
+queries are on a highway, half anywhere in the box.
+
+Usage: python benchmarks/bench_toll_index.py [--booths 10000,100000] [--queries 2000]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from utils.spatial_index import TollboothIndex  # noqa: E402
+
+BOX = (8.0, 35.0, 68.0, 97.0)  # lat_min, lat_max, lon_min, lon_max
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    # the helper receive_alert defined inline
+    R = 6371.0
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def linear_nearest(booths, lat, lon):
+    best = best_dist = None
+    for b in booths:
+        d = haversine_km(lat, lon, b[1], b[2])
+        if best is None or d < best_dist:
+            best, best_dist = b, d
+    return best, best_dist
+
+
+def make_booths(n, rng):
+    roads = [((rng.uniform(BOX[0], BOX[1]), rng.uniform(BOX[2], BOX[3])),
+              (rng.uniform(BOX[0], BOX[1]), rng.uniform(BOX[2], BOX[3]))) for _ in range(60)]
+    booths = []
+    for i in range(n):
+        (a_lat, a_lon), (b_lat, b_lon) = rng.choice(roads)
+        t = rng.random()
+        booths.append((i, a_lat + t * (b_lat - a_lat) + rng.gauss(0, 0.01),
+                       a_lon + t * (b_lon - a_lon) + rng.gauss(0, 0.01)))
+    return booths
+
+
+def make_queries(booths, n, rng):
+    out = []
+    for i in range(n):
+        if i % 2:
+            _, lat, lon = rng.choice(booths)
+            out.append((lat + rng.gauss(0, 0.05), lon + rng.gauss(0, 0.05)))
+        else:
+            out.append((rng.uniform(BOX[0], BOX[1]), rng.uniform(BOX[2], BOX[3])))
+    return out
+
+
+def timed(fn, queries):
+    t0 = time.perf_counter()
+    results = [fn(lat, lon) for lat, lon in queries]
+    return (time.perf_counter() - t0) / len(queries) * 1e6, results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--booths', default='10000,100000')
+    ap.add_argument('--queries', type=int, default=2000)
+    ap.add_argument('--linear-queries', type=int, default=100, help='queries for the (slow) linear baseline')
+    ap.add_argument('--radius-km', type=float, default=10.0)
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'booths':>7} {'load ms':>8} {'linear us':>10} {'nearest us':>11} {'k=5 us':>8} "
+          f"{'radius us':>10} {'full scans':>11} {'speedup':>8}")
+    for n in (int(v) for v in args.booths.split(',')):
+        booths = make_booths(n, rng)
+        queries = make_queries(booths, args.queries, rng)
+        index = TollboothIndex()
+        t0 = time.perf_counter()
+        index.load((i, lat, lon, {'id': i}) for i, lat, lon in booths)
+        load_ms = (time.perf_counter() - t0) * 1000.0
+
+        linear_us, expected = timed(lambda a, b: linear_nearest(booths, a, b), queries[:args.linear_queries])
+        nearest_us, got = timed(index.nearest, queries)
+        for (want, want_d), (info, d) in zip(expected, got):
+            assert abs(want_d - d) < 1e-6, (want, want_d, info, d)
+        k_us, _ = timed(lambda a, b: index.k_nearest(a, b, 5), queries)
+        radius_us, _ = timed(lambda a, b: index.within(a, b, args.radius_km), queries)
+        print(f"{n:7d} {load_ms:8.0f} {linear_us:10.0f} {nearest_us:11.1f} {k_us:8.1f} {radius_us:10.1f} "
+              f"{index.stats()['full_scans']:11d} {linear_us / nearest_us:7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Capture stage for the detection loops.
+
+FrameGrabber reads frames from a camera on its own thread and keeps only the
+newest ones in a small bounded buffer. Analysis code calls read() to get the
+freshest frame; anything older that was never consumed is counted as dropped,
+so the EAR we act on is never more than one frame behind the camera.
+"""
+import threading
+import time
+from collections import deque
+
+
+def cap_reader(cap):
+    """Adapt a cv2.VideoCapture to a read function returning a frame or None."""
+    def _read():
+        ret, frame = cap.read()
+        if not ret:
+            return None
+        return frame
+    return _read
+
+
+def request_capture_size(cap, width, aspect=4.0 / 3.0):
+    """Ask a cv2.VideoCapture for a native mode close to `width` pixels wide.
+
+    Cameras snap to the nearest mode they support. The previous mode is
+    restored if that comes out narrower than requested (upscaling would cost
+    more than the resize we are trying to avoid) or wider than the previous
+    mode (a bigger resize). Returns the actual (w, h).
+    """
+    import cv2
+
+    old_w = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+    old_h = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, int(round(width / aspect)))
+    w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if w and old_w and (w < width or w > old_w):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, old_w)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, old_h)
+        w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    return w, h
+
+
+class CaptureStats:
+    """Frame counters and capture-to-decision lag shared by the frame sources."""
+
+    def __init__(self):
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._last_lag = 0.0
+
+    def mark_processed(self, captured_at):
+        """Record that the frame captured at `captured_at` reached a decision."""
+        lag = time.monotonic() - captured_at
+        self.frames_processed += 1
+        self._lag_total += lag
+        self._last_lag = lag
+        if lag > self._lag_max:
+            self._lag_max = lag
+
+    def stats(self):
+        processed = self.frames_processed
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_dropped': self.frames_dropped,
+            'frames_processed': processed,
+            'lag_last_ms': self._last_lag * 1000.0,
+            'lag_avg_ms': (self._lag_total / processed * 1000.0) if processed else 0.0,
+            'lag_max_ms': self._lag_max * 1000.0,
+        }
+
+
+class FrameGrabber(CaptureStats):
+    """Background capture thread with a latest-frame buffer.
+
+    read_frame: callable returning the next frame, or None if no frame is ready.
+    Sources that hand back their latest frame without blocking (imutils'
+    VideoStream.read) are polled; a repeat of the same frame object is skipped
+    rather than counted as a new capture.
+    buffer_size: max frames kept; older frames are overwritten (and counted as
+    dropped) when the analysis loop falls behind.
+    """
+
+    def __init__(self, read_frame, buffer_size=1, name='capture'):
+        super().__init__()
+        self._read_frame = read_frame
+        self._buffer = deque(maxlen=max(1, int(buffer_size)))
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._name = name
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._update, name=self._name, daemon=True)
+        self._thread.start()
+        return self
+
+    def _update(self):
+        last = None
+        while not self._stop.is_set():
+            try:
+                frame = self._read_frame()
+            except Exception as e:
+                print(f"Capture error: {e}")
+                frame = None
+            if frame is None:
+                # camera not ready or transient failure; don't spin
+                time.sleep(0.01)
+                continue
+            if frame is last:
+                # non-blocking source with nothing new yet
+                time.sleep(0.005)
+                continue
+            last = frame
+            captured_at = time.monotonic()
+            with self._cond:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.frames_dropped += 1
+                self._buffer.append((self.frames_captured, captured_at, frame))
+                self.frames_captured += 1
+                self._cond.notify()
+
+    def wait_ready(self, timeout=5.0):
+        """Block until the first frame has arrived (without consuming it); False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.frames_captured > 0, timeout)
+
+    def read(self, timeout=1.0):
+        """Return the newest (seq, captured_at, frame) or None on timeout.
+
+        Frames older than the returned one are discarded and counted as dropped.
+        """
+        with self._cond:
+            if not self._buffer:
+                self._cond.wait(timeout)
+            if not self._buffer:
+                return None
+            item = self._buffer.pop()
+            self.frames_dropped += len(self._buffer)
+            self._buffer.clear()
+            return item
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        self._thread = None
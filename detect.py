@@ -1,139 +1,424 @@
 """
 Lightweight wrapper around the project's drowsiness detection logic.
 Provides start_detection(driver_id, callback) and stop_detection().
-The callback is called as callback(driver_id) when drowsiness is detected.
+The callback is called as callback(driver_id, details=...) when drowsiness is
+detected; details carries the alert kind and the driver's PERCLOS and blink rate.
+
+Each detection session (one driver / camera source) runs in its own worker
+process managed by a DetectorPool, so several cameras can be analysed at once
+without sharing the GIL. Alerts are relayed back to the parent process and
+delivered to the session's callback from a dispatcher thread.
 """
+import multiprocessing as mp
+import os
+import queue
 import threading
 import time
+from itertools import count
 from threading import Thread
-from scipy.spatial import distance as dist
 from imutils import face_utils
-import numpy as np
 import dlib
 import cv2
 import imutils
 from imutils.video import VideoStream
-import pygame
-
-_thread = None
-_stop = threading.Event()
-_running_driver = None
-
-
-def eye_aspect_ratio(eye):
-    A = dist.euclidean(eye[1], eye[5])
-    B = dist.euclidean(eye[2], eye[4])
-    C = dist.euclidean(eye[0], eye[3])
-    ear = (A + B) / (2.0 * C)
-    return ear
-
-
-def final_ear(shape):
-    (lStart, lEnd) = face_utils.FACIAL_LANDMARKS_IDXS["left_eye"]
-    (rStart, rEnd) = face_utils.FACIAL_LANDMARKS_IDXS["right_eye"]
-    leftEye = shape[lStart:lEnd]
-    rightEye = shape[rStart:rEnd]
-    leftEAR = eye_aspect_ratio(leftEye)
-    rightEAR = eye_aspect_ratio(rightEye)
-    ear = (leftEAR + rightEAR) / 2.0
-    return (ear, leftEye, rightEye)
-
-
-def lip_distance(shape):
-    top_lip = shape[50:53]
-    top_lip = np.concatenate((top_lip, shape[61:64]))
-    low_lip = shape[56:59]
-    low_lip = np.concatenate((low_lip, shape[65:68]))
-    top_mean = np.mean(top_lip, axis=0)
-    low_mean = np.mean(low_lip, axis=0)
-    distance = abs(top_mean[1] - low_mean[1])
-    return distance
-
-
-def _run(driver_id, alert_callback, webcam_index=0, alarm_path='Alert.wav'):
-    EYE_AR_THRESH = 0.3
-    EYE_AR_CONSEC_FRAMES = 30
-    YAWN_THRESH = 20
-    alarm_status = False
-    alarm_status2 = False
-    saying = False
-    COUNTER = 0
+from face_tracking import FaceTracker, format_stats
+from face_detectors import BACKENDS
+from features import FaceFeatures
+from recorder import LandmarkRecorder, wall_clock_offset
+from detection_engine import DriverSelector, LandmarkSampler, format_sampler_stats
+from governor import QualityGovernor
+from shm_ring import FrameRing, RingReader, capture_into_ring
+import model_registry
+
+
+def _run(driver_id, alert_callback, webcam_index=0, detect_every=1, stop_event=None,
+         ring_spec=None, target_fps=None, on_startup=None, landmark_every=3, on_stats=None, stats_interval=10.0,
+         extra_faces=0, detector='haar', record_dir=None):
+    entered = time.perf_counter()
+    selector = DriverSelector(extra_faces)
+    sampler = LandmarkSampler(landmark_every)
+    recorder = LandmarkRecorder(os.path.join(record_dir, str(driver_id)),
+                                ts_offset=wall_clock_offset()) if record_dir else None
+    if stop_event is None:
+        stop_event = threading.Event()
 
     print('Detector: loading predictor...')
-    detector = cv2.CascadeClassifier("haarcascade_frontalface_default.xml")
-    predictor = dlib.shape_predictor('shape_predictor_68_face_landmarks.dat')
+    # cached per process (already loaded if the server pre-warmed before forking);
+    # otherwise it loads on a thread while the camera opens
+    wait_for_models = model_registry.load_in_background(detector)
+    if ring_spec:
+        # frames come from a capture process through shared memory
+        print('Detector: attaching to shared-memory capture ring...')
+        ring = FrameRing.attach(ring_spec)
+        reader = RingReader(ring)
+        vs = None
+    else:
+        # no warm-up sleep: the loop skips frames until the stream delivers one
+        print('Detector: starting stream...')
+        vs = VideoStream(src=webcam_index).start()
+    camera_ready = time.perf_counter()
+    detector, predictor, model_load_ms = wait_for_models()
+    first_frame = True
+    tracker = FaceTracker(detector, detect_every=detect_every)
+    governor = QualityGovernor(target_fps, log=lambda m: print(f'Detector[{driver_id}]: {m}')) if target_fps else None
+    if governor:
+        governor.apply(tracker)
+    features = FaceFeatures()
 
-    print('Detector: starting stream...')
-    vs = VideoStream(src=webcam_index).start()
-    time.sleep(1.0)
+    started = time.monotonic()
+    last_stats = started
+
+    def _session_stats():
+        primary = selector.primary
+        return {'faces': tracker.stats(time.monotonic() - started), 'landmarks': sampler.stats(),
+                'driver': selector.stats(), 'eyes': primary.alert.eyes.stats() if primary else {}}
 
     try:
-        while not _stop.is_set():
-            frame = vs.read()
+        while not stop_event.is_set():
+            if vs is None:
+                item = reader.read(timeout=0.5)
+                captured_at, frame = item[1:] if item else (None, None)
+            else:
+                captured_at, frame = time.monotonic(), vs.read()
             if frame is None:
                 time.sleep(0.1)
                 continue
-            frame = imutils.resize(frame, width=450)
+            frame_started = time.perf_counter()
+            width = governor.width if governor else 450
+            if frame.shape[1] != width:
+                frame = imutils.resize(frame, width=width)
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-            rects = detector.detectMultiScale(gray, scaleFactor=1.1,
-                                             minNeighbors=5, minSize=(30, 30),
-                                             flags=cv2.CASCADE_SCALE_IMAGE)
-            for (x, y, w, h) in rects:
+            rects = tracker.update(gray)
+            # only the driver's face raises alerts; passengers are skipped or sampled rarely
+            faces = selector.update(rects, gray.shape)
+            sampler.begin_frame(selector.visible_ids())
+            for face in faces:
+                if not sampler.due(face.id):
+                    continue
+                t0 = time.perf_counter()
+                x, y, w, h = face.rect
                 rect = dlib.rectangle(int(x), int(y), int(x + w), int(y + h))
                 shape = predictor(gray, rect)
                 shape = face_utils.shape_to_np(shape)
-                eye = final_ear(shape)
-                ear = eye[0]
-                distance = lip_distance(shape)
-
-                if ear < EYE_AR_THRESH:
-                    COUNTER += 1
-                    if COUNTER >= EYE_AR_CONSEC_FRAMES:
-                        if not alarm_status:
-                            alarm_status = True
-                            # notify
-                            try:
-                                alert_callback(driver_id)
-                            except Exception:
-                                pass
-                else:
-                    COUNTER = 0
-                    alarm_status = False
-
-                if distance > YAWN_THRESH:
-                    if not alarm_status2 and not saying:
-                        alarm_status2 = True
-                        try:
-                            alert_callback(driver_id)
-                        except Exception:
-                            pass
-                else:
-                    alarm_status2 = False
+                tracker.observe(face.index, shape)
+                landmark_s = time.perf_counter() - t0
+                _, _, ear, distance = features(shape)
+
+                if recorder is not None:
+                    recorder.append(captured_at, face.id, face is selector.primary, ear, distance, shape)
+                sampler.record(face.id, ear, distance, landmark_s)
+                raised = face.alert.update(ear, distance, captured_at)
+                if face is not selector.primary:
+                    continue
+                for kind in raised:
+                    # notify, with the driver's PERCLOS and blink rate at alert time
+                    try:
+                        alert_callback(driver_id, dict(face.alert.eyes.stats(), kind=kind))
+                    except Exception:
+                        pass
+
+            if first_frame:
+                first_frame = False
+                startup = {
+                    'model_load_ms': model_load_ms,
+                    'camera_open_ms': (camera_ready - entered) * 1000.0,
+                    'time_to_first_frame_ms': (time.perf_counter() - entered) * 1000.0,
+                }
+                print('Detector: first frame after {time_to_first_frame_ms:.0f}ms (camera {camera_open_ms:.0f}ms, '
+                      'models {model_load_ms:.0f}ms in parallel)'.format(**startup))
+                if on_startup:
+                    on_startup(startup)
+
+            if governor and governor.observe(time.perf_counter() - frame_started):
+                governor.apply(tracker)
+                tracker.reset()
+
+            if on_stats and time.monotonic() - last_stats >= stats_interval:
+                last_stats = time.monotonic()
+                on_stats(_session_stats())
 
             # small sleep to yield
             time.sleep(0.01)
 
     finally:
-        vs.stop()
+        if vs is None:
+            ring.close()
+        else:
+            vs.stop()
+        if recorder is not None:
+            recorder.close()
+        print('Detector: ' + format_stats(tracker.stats(time.monotonic() - started)))
+        print('Detector: ' + format_sampler_stats(sampler.stats()))
+        if on_stats:
+            on_stats(_session_stats())
+
+
+def _worker(session_id, generation, driver_id, source, stop_event, events, options):
+    """Worker process entry point: run one session, reporting back on `events`.
+
+    Every event carries (session_id, generation) so the pool can drop late
+    messages from an earlier run of a restarted session.
+    """
+    key = (session_id, generation)
+
+    def _alert(d, details=None):
+        events.put(('alert', key, d, details))
 
+    def _startup(info):
+        events.put(('startup', key, info))
 
-def start_detection(driver_id, alert_callback, webcam_index=0):
-    global _thread, _stop, _running_driver
-    if _thread and _thread.is_alive():
-        print('Detection already running')
+    def _stats(info):
+        events.put(('stats', key, info))
+
+    events.put(('state', key, 'running', None))
+    try:
+        _run(driver_id, _alert, source, stop_event=stop_event, on_startup=_startup, on_stats=_stats, **options)
+    except Exception as e:
+        events.put(('state', key, 'failed', str(e)))
         return
-    _stop.clear()
-    _running_driver = driver_id
-    _thread = Thread(target=_run, args=(driver_id, alert_callback, webcam_index))
-    _thread.daemon = True
-    _thread.start()
-
-
-def stop_detection():
-    global _thread, _stop, _running_driver
-    _stop.set()
-    if _thread:
-        _thread.join(timeout=2.0)
-    _thread = None
-    _running_driver = None
+    events.put(('state', key, 'stopped', None))
+
+
+class PoolFullError(RuntimeError):
+    """Raised when every worker slot is busy."""
+
+
+class DetectorPool:
+    """Run many (driver_id, source) detection sessions in worker processes.
+
+    max_workers bounds the number of concurrently running processes (default:
+    one per CPU core); a shared-capture session takes two slots, one for its
+    capture process, unless the pool only has one. When all slots are taken,
+    start() raises PoolFullError, or with block=True waits up to `timeout`
+    seconds for slots to free up.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max(1, int(max_workers or os.cpu_count() or 1))
+        self._ctx = mp.get_context()
+        self._events = self._ctx.Queue()
+        self._sessions = {}
+        self._cond = threading.Condition()
+        self._dispatcher = None
+        self._generations = count(1)
+
+    def _active(self):
+        return [s for s in self._sessions.values() if s['state'] in ('starting', 'running')]
+
+    def _slots_used(self):
+        return sum(2 if s['capture_process'] is not None else 1 for s in self._active())
+
+    def _reap(self):
+        # catch workers that died without reporting (crash, kill)
+        for s in self._sessions.values():
+            if s['state'] in ('starting', 'running') and not s['process'].is_alive():
+                s['state'] = 'failed' if s['process'].exitcode else 'stopped'
+                s['stopped_at'] = time.time()
+            if s['state'] not in ('starting', 'running') and s['capture_process'] is not None:
+                self._release_capture(s)
+
+    @staticmethod
+    def _release_capture(s, timeout=1.0):
+        # a shared-capture session's capture process holds the camera and the ring
+        s['stop_event'].set()
+        proc = s['capture_process']
+        if proc is None:
+            return
+        proc.join(timeout=timeout)
+        if proc.is_alive():
+            proc.terminate()
+            proc.join(timeout=1.0)
+        s['ring'].close()
+        s['capture_process'] = s['ring'] = None
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher and self._dispatcher.is_alive():
+            return
+        self._dispatcher = Thread(target=self._dispatch, name='detector-pool-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch(self):
+        while True:
+            try:
+                msg = self._events.get(timeout=1.0)
+            except queue.Empty:
+                with self._cond:
+                    self._reap()
+                    self._cond.notify_all()
+                continue
+            kind, (session_id, generation) = msg[0], msg[1]
+            with self._cond:
+                s = self._sessions.get(session_id)
+                if s is None or s['generation'] != generation:
+                    # unknown, or a late message from a previous run of this session
+                    continue
+                if kind == 'alert':
+                    s['alerts'] += 1
+                    s['last_alert_at'] = time.time()
+                    callback = s['callback']
+                elif kind == 'startup':
+                    # include process start-up, measured from the start() call
+                    s['startup'] = dict(msg[2], since_start_ms=(time.time() - s['started_at']) * 1000.0)
+                    continue
+                elif kind == 'stats':
+                    s['stats'] = msg[2]
+                    continue
+                elif kind == 'state':
+                    s['state'] = msg[2]
+                    if msg[3]:
+                        s['error'] = msg[3]
+                    if msg[2] in ('stopped', 'failed'):
+                        s['stopped_at'] = time.time()
+                    self._cond.notify_all()
+                    continue
+            try:
+                callback(msg[2], details=msg[3])
+            except Exception:
+                pass
+
+    def start(self, session_id, driver_id, alert_callback, source=0, block=False, timeout=None,
+              shared_capture=False, **options):
+        """Start a session; options are passed to the detection loop (e.g. detect_every).
+
+        With shared_capture=True the camera is read by a separate capture
+        process that hands frames to the worker through a shared-memory ring.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._reap()
+            existing = self._sessions.get(session_id)
+            if existing and existing['state'] in ('starting', 'running'):
+                raise ValueError(f'session {session_id} already running')
+            if existing:
+                # free the old session's camera before this one tries to open it
+                self._release_capture(existing)
+            needed = min(self.max_workers, 2 if shared_capture else 1)
+            while self._slots_used() + needed > self.max_workers:
+                if not block:
+                    raise PoolFullError(f'all {self.max_workers} detector workers are busy')
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolFullError(f'no detector worker freed up within {timeout}s')
+                self._cond.wait(remaining if remaining is not None else 1.0)
+                self._reap()
+
+            generation = next(self._generations)
+            stop_event = self._ctx.Event()
+            ring = capture_proc = None
+            if shared_capture:
+                ring = FrameRing(max_shape=(450, 450, 3))
+                options = dict(options, ring_spec=ring.spec())
+                capture_proc = self._ctx.Process(target=capture_into_ring, name=f'capture-{session_id}',
+                                                 daemon=True, args=(ring.spec(), source, 450, stop_event))
+                capture_proc.start()
+            proc = self._ctx.Process(target=_worker, name=f'detector-{session_id}', daemon=True,
+                                     args=(session_id, generation, driver_id, source, stop_event, self._events,
+                                           options))
+            proc.start()
+            self._sessions[session_id] = {
+                'session_id': session_id,
+                'generation': generation,
+                'driver_id': driver_id,
+                'source': source,
+                'shared_capture': bool(shared_capture),
+                'state': 'starting',
+                'process': proc,
+                'capture_process': capture_proc,
+                'ring': ring,
+                'stop_event': stop_event,
+                'callback': alert_callback,
+                'started_at': time.time(),
+                'stopped_at': None,
+                'alerts': 0,
+                'last_alert_at': None,
+                'startup': None,
+                'stats': None,
+                'error': None,
+            }
+            self._ensure_dispatcher()
+        return session_id
+
+    def stop(self, session_id, timeout=2.0):
+        """Stop one session. Returns False if it is unknown."""
+        with self._cond:
+            s = self._sessions.get(session_id)
+        if s is None:
+            return False
+        s['stop_event'].set()
+        s['process'].join(timeout=timeout)
+        if s['process'].is_alive():
+            s['process'].terminate()
+            s['process'].join(timeout=1.0)
+        with self._cond:
+            self._release_capture(s, timeout)
+            self._reap()
+            self._cond.notify_all()
+        return True
+
+    def stop_all(self, timeout=2.0):
+        with self._cond:
+            ids = [sid for sid, s in self._sessions.items() if s['state'] in ('starting', 'running')]
+        for sid in ids:
+            self.stop(sid, timeout=timeout)
+
+    def status(self, session_id=None):
+        """Status dict for one session, or {session_id: status} for all of them."""
+        with self._cond:
+            self._reap()
+            if session_id is not None:
+                s = self._sessions.get(session_id)
+                return self._public(s) if s else None
+            return {sid: self._public(s) for sid, s in self._sessions.items()}
+
+    @staticmethod
+    def _public(s):
+        out = {k: v for k, v in s.items() if k not in ('process', 'capture_process', 'ring', 'stop_event', 'callback')}
+        out['pid'] = s['process'].pid
+        return out
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def prewarm():
+    """Load the models in this process so forked workers share them; returns load times."""
+    return model_registry.prewarm()
+
+
+def get_pool():
+    """Return the process-wide DetectorPool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DetectorPool(int(os.environ.get('DETECTOR_WORKERS', 0)) or None)
+        return _pool
+
+
+def start_detection(driver_id, alert_callback, webcam_index=0, detect_every=1, session_id=None,
+                    shared_capture=False, target_fps=None, landmark_every=3, detector='haar', record_dir=None):
+    """Start detection for driver_id on a camera index or video source.
+
+    Returns the session id (defaults to driver_id). Raises PoolFullError when
+    no worker is free and ValueError if the session is already running or the
+    detector backend is unknown.
+    """
+    if detector not in BACKENDS:
+        raise ValueError(f"unknown face detector {detector!r}; choose from {', '.join(BACKENDS)}")
+    session_id = session_id or driver_id
+    return get_pool().start(session_id, driver_id, alert_callback, source=webcam_index,
+                            shared_capture=shared_capture, detect_every=detect_every, target_fps=target_fps,
+                            landmark_every=landmark_every, detector=detector, record_dir=record_dir)
+
+
+def stop_detection(session_id=None):
+    """Stop one session, or every running session when session_id is None."""
+    if session_id is None:
+        get_pool().stop_all()
+        return True
+    return get_pool().stop(session_id)
+
+
+def detection_status(session_id=None):
+    return get_pool().status(session_id)
@@ -0,0 +1,410 @@
+"""
+Per-face decision logic shared by drowsiness_yawn.py and detect.py.
+
+AlertState turns timestamped EAR / lip-distance samples into drowsiness and
+yawn alerts.
+LandmarkSampler decides, per face and per frame, whether the landmark
+predictor has to run: while the eyes are clearly open and the mouth is closed
+it only runs every `sparse_every` frames, and it switches to every frame as
+soon as a sample comes near EYE_AR_THRESH or YAWN_THRESH.
+EyeClosureStats keeps PERCLOS and the blink rate over a sliding window.
+DriverSelector gives detected faces stable ids, picks the driver among them
+and keeps an AlertState per face, so a passenger neither costs a landmark
+pass every frame nor corrupts the driver's timers.
+"""
+from collections import deque
+from itertools import count
+
+from face_tracking import iou
+
+EYE_AR_THRESH = 0.3
+# eyes closed this long raise a drowsiness alert (was 30 frames, i.e. 1 s at 30 fps)
+EYE_AR_CONSEC_SECONDS = 1.0
+YAWN_THRESH = 20
+# mouth open this long raises a yawn alert; closed this long re-arms it
+YAWN_SECONDS = 0.5
+YAWN_REARM_SECONDS = 1.0
+# sliding window for PERCLOS and blink rate
+EYE_STATS_WINDOW_SECONDS = 60.0
+
+
+class EyeClosureStats:
+    """PERCLOS and blink rate over the last `window` seconds, O(1) per sample.
+
+    Samples are held until the next one, so each sample interval is counted
+    as closed or open by its first sample; this keeps PERCLOS time-weighted
+    when the frame rate or the landmark cadence varies. Intervals and blink
+    times sit in bounded deques with running sums: every sample is added once
+    and evicted once, and nothing else is kept.
+
+    A blink is a closed run lasting between blink_min and blink_max seconds;
+    longer closures count towards PERCLOS only.
+    """
+
+    def __init__(self, ear_thresh=EYE_AR_THRESH, window=EYE_STATS_WINDOW_SECONDS, blink_min=0.05,
+                 blink_max=0.5, capacity=8192):
+        self.ear_thresh = ear_thresh
+        self.window = window
+        self.blink_min = blink_min
+        self.blink_max = blink_max
+        self._spans = deque(maxlen=capacity)
+        self._blinks = deque(maxlen=capacity)
+        self._total = 0.0
+        self._closed = 0.0
+        self._last_ts = None
+        self._last_closed = False
+        self._run_start = None
+        self.blinks = 0
+
+    def update(self, ear, ts):
+        closed = ear < self.ear_thresh
+        if self._last_ts is not None and ts > self._last_ts:
+            if len(self._spans) == self._spans.maxlen:
+                self._evict()
+            dt = ts - self._last_ts
+            self._spans.append((ts, dt, self._last_closed))
+            self._total += dt
+            if self._last_closed:
+                self._closed += dt
+        if closed and not self._last_closed:
+            self._run_start = ts
+        elif not closed and self._last_closed and self._run_start is not None:
+            if self.blink_min <= ts - self._run_start <= self.blink_max:
+                self._blinks.append(ts)
+                self.blinks += 1
+        self._last_ts = ts
+        self._last_closed = closed
+
+        horizon = ts - self.window
+        while self._spans and self._spans[0][0] <= horizon:
+            self._evict()
+        while self._blinks and self._blinks[0] <= horizon:
+            self._blinks.popleft()
+
+    def _evict(self):
+        _, dt, was_closed = self._spans.popleft()
+        self._total -= dt
+        if was_closed:
+            self._closed -= dt
+
+    def perclos(self):
+        """Fraction of the window (0..1) with the eyes closed."""
+        return max(0.0, self._closed) / self._total if self._total > 0 else 0.0
+
+    def blink_rate(self):
+        """Blinks per minute over the window (or the part of it seen so far)."""
+        span = min(self.window, self._total)
+        return len(self._blinks) * 60.0 / span if span > 0 else 0.0
+
+    def stats(self):
+        return {
+            'perclos': self.perclos(),
+            'blinks_per_min': self.blink_rate(),
+            'blinks': self.blinks,
+            'window_s': min(self.window, self._total),
+        }
+
+
+class AlertState:
+    """Closed-eye and yawn timers for one face, driven by capture timestamps.
+
+    Conditions are measured in seconds between frame timestamps, not in frame
+    counts, so alert latency does not depend on the frame rate or on frames
+    the landmark sampler skipped. A condition starts at the first sample that
+    shows it, so a drowsiness alert fires between closed_seconds and
+    closed_seconds plus one sample interval after the eyes close, never
+    earlier (likewise yawn_seconds for the mouth).
+
+    Nothing is known about the face while the tracker has lost it, so after
+    mark_lost() the closed-eye, open-mouth and re-arm timers restart from the
+    next sample. Gaps left by a low frame rate or by the landmark sampler do
+    not reset anything.
+
+    `eyes` holds the face's PERCLOS and blink rate over `stats_window` seconds.
+    """
+
+    def __init__(self, ear_thresh=EYE_AR_THRESH, closed_seconds=EYE_AR_CONSEC_SECONDS,
+                 yawn_thresh=YAWN_THRESH, yawn_seconds=YAWN_SECONDS, yawn_rearm_seconds=YAWN_REARM_SECONDS,
+                 stats_window=EYE_STATS_WINDOW_SECONDS):
+        self.ear_thresh = ear_thresh
+        self.eyes = EyeClosureStats(ear_thresh, stats_window)
+        self.closed_seconds = closed_seconds
+        self.yawn_thresh = yawn_thresh
+        self.yawn_seconds = yawn_seconds
+        self.yawn_rearm_seconds = yawn_rearm_seconds
+        self.lost = False
+        self.closed_since = None
+        self.open_since = None
+        self.mouth_closed_since = None
+        self.drowsy = False
+        self.yawning = False
+
+    def closed_for(self, ts):
+        """Seconds the eyes have been closed as of `ts` (0.0 when open)."""
+        return ts - self.closed_since if self.closed_since is not None else 0.0
+
+    def mark_lost(self):
+        """The face was not detected in a frame; the timers restart at the next sample."""
+        self.lost = True
+
+    def update(self, ear, lip, ts, allow_yawn=True):
+        """Feed one sample taken at `ts` (seconds); returns the alerts it raised ('drowsiness', 'yawn')."""
+        raised = []
+        self.eyes.update(ear, ts)
+        if self.lost:
+            self.closed_since = self.open_since = self.mouth_closed_since = None
+            self.lost = False
+        if ear < self.ear_thresh:
+            if self.closed_since is None:
+                self.closed_since = ts
+            if not self.drowsy and ts - self.closed_since >= self.closed_seconds:
+                self.drowsy = True
+                raised.append('drowsiness')
+        else:
+            self.closed_since = None
+            self.drowsy = False
+
+        if lip > self.yawn_thresh:
+            self.mouth_closed_since = None
+            if self.open_since is None:
+                self.open_since = ts
+            if not self.yawning and allow_yawn and ts - self.open_since >= self.yawn_seconds:
+                self.yawning = True
+                raised.append('yawn')
+        else:
+            self.open_since = None
+            if self.mouth_closed_since is None:
+                self.mouth_closed_since = ts
+            if self.yawning and ts - self.mouth_closed_since >= self.yawn_rearm_seconds:
+                self.yawning = False
+        return raised
+
+
+class _Slot:
+    __slots__ = ('since', 'calm', 'ear', 'lip')
+
+    def __init__(self):
+        self.since = 0
+        self.calm = 0
+        self.ear = None
+        self.lip = None
+
+
+class LandmarkSampler:
+    """Adaptive landmark cadence per face.
+
+    sparse_every: run landmarks every N frames while the face is calm (1 disables).
+    ear_margin / lip_margin: how close to the thresholds a sample may get and
+        still count as calm.
+    calm_samples: consecutive calm samples needed before going sparse.
+    """
+
+    def __init__(self, sparse_every=3, ear_thresh=EYE_AR_THRESH, yawn_thresh=YAWN_THRESH,
+                 ear_margin=0.05, lip_margin=5.0, calm_samples=5):
+        self.sparse_every = max(1, int(sparse_every))
+        self.ear_calm = ear_thresh + ear_margin
+        self.lip_calm = yawn_thresh - lip_margin
+        self.calm_samples = calm_samples
+        self._slots = {}
+        self.run = 0
+        self.skipped = 0
+        self._cost = 0.0
+
+    def begin_frame(self, keys):
+        """Call once per frame with the ids of the visible faces; vanished faces are forgotten."""
+        slots = {}
+        for key in keys:
+            slot = self._slots.get(key) or _Slot()
+            slot.since += 1
+            slots[key] = slot
+        self._slots = slots
+
+    def due(self, key):
+        """True if landmarks must run for face `key` in this frame."""
+        slot = self._slots[key]
+        if slot.calm < self.calm_samples or slot.since >= self.sparse_every:
+            return True
+        self.skipped += 1
+        return False
+
+    def record(self, key, ear, lip, seconds=0.0):
+        """Store a landmark sample.
+
+        seconds: time the predictor took, used to estimate the CPU saved.
+        """
+        slot = self._slots[key]
+        slot.since = 0
+        slot.ear = ear
+        slot.lip = lip
+        slot.calm = slot.calm + 1 if ear >= self.ear_calm and lip <= self.lip_calm else 0
+        self.run += 1
+        self._cost += seconds
+
+    def last(self, key):
+        """(ear, lip) of the latest sample for face `key` (None before the first)."""
+        slot = self._slots[key]
+        return slot.ear, slot.lip
+
+    def stats(self):
+        total = self.run + self.skipped
+        avg_ms = self._cost / self.run * 1000.0 if self.run else 0.0
+        return {
+            'landmarks_run': self.run,
+            'landmarks_skipped': self.skipped,
+            'skip_ratio': self.skipped / total if total else 0.0,
+            'landmark_ms_avg': avg_ms,
+            'landmark_ms_saved': self.skipped * avg_ms,
+        }
+
+
+class _Face:
+    __slots__ = ('id', 'rect', 'index', 'alert', 'missed', 'since', 'score')
+
+    def __init__(self, face_id, rect, alert):
+        self.id = face_id
+        self.rect = rect
+        self.index = None
+        self.alert = alert
+        self.missed = 0
+        self.since = 0
+        self.score = 0.0
+
+
+class DriverSelector:
+    """Pick and stick to the driver's face among the detected rectangles.
+
+    Faces are matched across frames by overlap and keep their id and their own
+    AlertState. The driver is the face with the best mix of size and
+    closeness to `anchor_x` (fraction of the frame width where the driver
+    sits). Another face takes over only after scoring `switch_margin` higher
+    for `switch_frames` frames in a row, or when the driver has been missing
+    for `lost_frames` frames.
+
+    max_extra: other faces to keep analysing (at one frame in `extra_every`).
+    alert_kwargs: arguments for each face's AlertState.
+    """
+
+    def __init__(self, max_extra=0, extra_every=5, anchor_x=0.5, size_weight=0.6, min_iou=0.3,
+                 switch_margin=0.2, switch_frames=15, lost_frames=10, alert_kwargs=None):
+        self.max_extra = max(0, int(max_extra))
+        self.extra_every = max(1, int(extra_every))
+        self.anchor_x = anchor_x
+        self.size_weight = size_weight
+        self.min_iou = min_iou
+        self.switch_margin = switch_margin
+        self.switch_frames = switch_frames
+        self.lost_frames = lost_frames
+        self.alert_kwargs = alert_kwargs or {}
+        self._faces = {}
+        self._ids = count(1)
+        self._primary = None
+        self._challenger = None
+        self._challenge = 0
+
+        self.switches = 0
+        self.extra_runs = 0
+        self.ignored = 0
+
+    @property
+    def primary(self):
+        """The driver's _Face, or None before one has been seen."""
+        return self._faces.get(self._primary)
+
+    def visible_ids(self):
+        return [f.id for f in self._faces.values() if f.index is not None]
+
+    def _match(self, rects):
+        for f in self._faces.values():
+            f.index = None
+        pairs = sorted(((iou(f.rect, r), f.id, i) for f in self._faces.values() for i, r in enumerate(rects)),
+                       reverse=True)
+        used = set()
+        for overlap, fid, i in pairs:
+            face = self._faces[fid]
+            if overlap < self.min_iou or face.index is not None or i in used:
+                continue
+            face.index = i
+            face.rect = tuple(rects[i])
+            face.missed = 0
+            used.add(i)
+        for i, r in enumerate(rects):
+            if i not in used:
+                face = _Face(next(self._ids), tuple(r), AlertState(**self.alert_kwargs))
+                face.index = i
+                self._faces[face.id] = face
+        for fid in [f.id for f in self._faces.values() if f.index is None]:
+            face = self._faces[fid]
+            face.missed += 1
+            face.alert.mark_lost()
+            if face.missed > self.lost_frames:
+                del self._faces[fid]
+
+    def _score(self, visible, frame_w):
+        largest = max(f.rect[2] * f.rect[3] for f in visible)
+        for f in visible:
+            x, _, w, h = f.rect
+            size = (w * h) / largest
+            centre = 1.0 - min(1.0, abs((x + w / 2.0) / frame_w - self.anchor_x) * 2.0)
+            f.score = self.size_weight * size + (1.0 - self.size_weight) * centre
+
+    def update(self, rects, frame_shape):
+        """Match this frame's rectangles; returns the faces to analyse, driver first.
+
+        Each returned face has .index (position in `rects`), .id, .rect and .alert.
+        """
+        self._match(rects)
+        visible = [f for f in self._faces.values() if f.index is not None]
+        if not visible:
+            return []
+        self._score(visible, frame_shape[1])
+        best = max(visible, key=lambda f: f.score)
+        primary = self.primary
+        if primary is None:
+            self._set_primary(best)
+        elif primary.index is not None:
+            if best is primary or best.score <= primary.score + self.switch_margin:
+                self._challenger = None
+                self._challenge = 0
+            elif best.id == self._challenger:
+                self._challenge += 1
+            else:
+                self._challenger = best.id
+                self._challenge = 1
+            if self._challenge >= self.switch_frames:
+                self._set_primary(best)
+
+        out = []
+        primary = self.primary
+        if primary is not None and primary.index is not None:
+            out.append(primary)
+        others = sorted((f for f in visible if f is not primary), key=lambda f: f.score, reverse=True)
+        for f in others[:self.max_extra]:
+            f.since += 1
+            if f.since >= self.extra_every:
+                f.since = 0
+                self.extra_runs += 1
+                out.append(f)
+        self.ignored += len(visible) - len(out)
+        return out
+
+    def _set_primary(self, face):
+        if self._primary is not None:
+            self.switches += 1
+        self._primary = face.id
+        self._challenger = None
+        self._challenge = 0
+
+    def stats(self):
+        primary = self.primary
+        return {
+            'faces': len(self._faces),
+            'primary_id': primary.id if primary else -1,
+            'switches': self.switches,
+            'extra_runs': self.extra_runs,
+            'faces_ignored': self.ignored,
+        }
+
+
+def format_sampler_stats(st):
+    return ("landmarks: run={landmarks_run} skipped={landmarks_skipped} ({skip_ratio:.0%}) "
+            "avg={landmark_ms_avg:.1f}ms saved~{landmark_ms_saved:.0f}ms".format(**st))
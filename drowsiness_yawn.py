@@ -1,32 +1,50 @@
 #python drowniness_yawn.py --webcam webcam_index
 
-from scipy.spatial import distance as dist
-from imutils.video import VideoStream
+import time
+# startup phases are reported relative to this point; see _report_startup()
+_startup_t0 = time.perf_counter()
 from imutils import face_utils
 from threading import Thread
-import numpy as np
 import argparse
 import imutils
-import time
 import dlib
 import cv2
-import playsound
 import os
-import requests
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import json
-from threading import Lock
-
-# GPS globals
-current_lat = None
-current_lon = None
-gps_lock = Lock()
+from capture import FrameGrabber, cap_reader, request_capture_size
+from governor import QualityGovernor
+from shm_ring import FrameRing, RingReader, capture_into_ring
+import multiprocessing as mp
+from face_tracking import FaceTracker, format_stats
+from face_detectors import BACKENDS
+from replay import iter_frames, DecisionWriter
+from recorder import LandmarkRecorder, wall_clock_offset
+from metrics import Metrics, StageTimer
+from alert_sender import AlertSender
+from location_uplink import LocationUplink, bulk_location_url
+from datetime import datetime, timezone
+from features import FaceFeatures, LEFT_EYE, RIGHT_EYE, MOUTH
+from detection_engine import (DriverSelector, LandmarkSampler, format_sampler_stats,
+                              EYE_AR_CONSEC_SECONDS, YAWN_SECONDS, YAWN_REARM_SECONDS,
+                              EYE_STATS_WINDOW_SECONDS)
+from nmea import LatestFix, serial_lines, log_lines, run_reader
+import model_registry
+
+# playsound, requests (alert_sender, location_uplink) and pyserial (nmea) are
+# imported on first use, off the path to the first analysed frame
+startup = {'imports_ms': (time.perf_counter() - _startup_t0) * 1000.0}
+
+# latest GPS / local-update position, written by one thread and read lock-free
+gps_fix = LatestFix()
+gps_stats = {}
 
 
 def sound_alarm(path):
     global alarm_status
     global alarm_status2
     global saying
+    import playsound
 
     while alarm_status:
         print('call')
@@ -37,43 +55,6 @@ def sound_alarm(path):
         playsound.playsound(path)
         saying = False
 
-def eye_aspect_ratio(eye):
-    A = dist.euclidean(eye[1], eye[5])
-    B = dist.euclidean(eye[2], eye[4])
-
-    C = dist.euclidean(eye[0], eye[3])
-
-    ear = (A + B) / (2.0 * C)
-
-    return ear
-
-def final_ear(shape):
-    (lStart, lEnd) = face_utils.FACIAL_LANDMARKS_IDXS["left_eye"]
-    (rStart, rEnd) = face_utils.FACIAL_LANDMARKS_IDXS["right_eye"]
-
-    leftEye = shape[lStart:lEnd]
-    rightEye = shape[rStart:rEnd]
-
-    leftEAR = eye_aspect_ratio(leftEye)
-    rightEAR = eye_aspect_ratio(rightEye)
-
-    ear = (leftEAR + rightEAR) / 2.0
-    return (ear, leftEye, rightEye)
-
-def lip_distance(shape):
-    top_lip = shape[50:53]
-    top_lip = np.concatenate((top_lip, shape[61:64]))
-
-    low_lip = shape[56:59]
-    low_lip = np.concatenate((low_lip, shape[65:68]))
-
-    top_mean = np.mean(top_lip, axis=0)
-    low_mean = np.mean(low_lip, axis=0)
-
-    distance = abs(top_mean[1] - low_mean[1])
-    return distance
-
-
 ap = argparse.ArgumentParser()
 ap.add_argument("-w", "--webcam", type=int, default=0, help="index of webcam on system")
 ap.add_argument("-a", "--alarm", type=str, default="Alert.wav", help="path alarm .WAV file")
@@ -86,27 +67,168 @@ ap.add_argument("--lat", type=float, default=0.0, help="latitude to include with
 ap.add_argument("--lon", type=float, default=0.0, help="longitude to include with alerts (default 0.0)")
 ap.add_argument("--gps-port", type=str, default=None, help="Serial port for GPS (e.g., COM3 or /dev/ttyUSB0)")
 ap.add_argument("--gps-baud", type=int, default=4800, help="GPS serial baud rate (default 4800)")
+ap.add_argument("--gps-log", type=str, default=None,
+                help="replay a recorded NMEA log file as the GPS source instead of a serial port")
+ap.add_argument("--gps-log-speed", type=float, default=1.0,
+                help="NMEA log replay speed (1 = real time, 10 = ten times faster, 0 = as fast as possible)")
 ap.add_argument("--listen-port", type=int, default=5001, help="Local HTTP port to accept location POSTs")
+ap.add_argument("--detector", type=str, default="haar", choices=sorted(BACKENDS),
+                help="face detector backend (see benchmarks/bench_detectors.py to pick one for your hardware)")
+ap.add_argument("--detect-every", type=int, default=1,
+                help="run the face cascade every N frames and track faces from landmarks in between (1 = every frame)")
+ap.add_argument("--landmark-every", type=int, default=3,
+                help="run landmarks only every N frames while eyes are clearly open and the mouth closed (1 = every frame)")
+ap.add_argument("--eye-closed-seconds", type=float, default=EYE_AR_CONSEC_SECONDS,
+                help="seconds the eyes must stay closed before a drowsiness alert")
+ap.add_argument("--yawn-seconds", type=float, default=YAWN_SECONDS,
+                help="seconds the mouth must stay open before a yawn alert")
+ap.add_argument("--yawn-rearm-seconds", type=float, default=YAWN_REARM_SECONDS,
+                help="seconds the mouth must stay closed before another yawn alert")
+ap.add_argument("--perclos-window", type=float, default=EYE_STATS_WINDOW_SECONDS,
+                help="seconds of history for PERCLOS and blink rate (blink counts need --landmark-every 1 to catch every blink)")
+ap.add_argument("--driver-x", type=float, default=0.5,
+                help="where the driver sits across the frame (0 = left edge, 1 = right edge); used to pick the driver's face")
+ap.add_argument("--extra-faces", type=int, default=0,
+                help="other faces (passengers) to keep analysing besides the driver")
+ap.add_argument("--extra-face-every", type=int, default=5,
+                help="run landmarks on extra faces only every N frames")
+ap.add_argument("--track-min-iou", type=float, default=0.5,
+                help="re-detect faces when the landmark-tracked box overlaps the previous one less than this")
+ap.add_argument("--stats-interval", type=float, default=10.0,
+                help="seconds between capture stats printouts (0 disables)")
+ap.add_argument("--input", type=str, default=None,
+                help="replay a video file or directory of frames headless instead of using the webcam")
+ap.add_argument("--output", type=str, default=None,
+                help="CSV file for per-frame EAR, lip distance and alert decisions (replay mode)")
+ap.add_argument("--replay-fps", type=float, default=30.0,
+                help="frame rate assumed for a directory of frames (replay mode)")
+ap.add_argument("--record", type=str, default=None,
+                help="directory to record per-face timestamps, landmarks, EAR and lip distance into (binary .npy files)")
+ap.add_argument("--record-rows", type=int, default=108000,
+                help="records per recording file before rotating to a new one")
+ap.add_argument("--capture-process", action="store_true",
+                help="capture in a separate process and hand frames over through a shared-memory ring")
+ap.add_argument("--camera-timeout", type=float, default=10.0,
+                help="seconds to wait for the first camera frame before warning (the loop keeps waiting)")
+ap.add_argument("--ring-slots", type=int, default=4, help="frame slots in the shared-memory ring")
+ap.add_argument("--target-fps", type=float, default=0.0,
+                help="adapt frame width and cascade settings to hold this frame rate (0 disables)")
+ap.add_argument("--alert-spool", type=str, default="alert_spool.jsonl",
+                help="file that keeps undelivered alerts across network outages and restarts")
+ap.add_argument("--location-sample", type=float, default=1.0, help="seconds between location samples")
+ap.add_argument("--location-batch", type=int, default=20, help="upload locations once this many fixes are buffered")
+ap.add_argument("--location-flush", type=float, default=30.0,
+                help="upload buffered locations at least this often (seconds)")
+ap.add_argument("--location-deadband", type=float, default=25.0,
+                help="drop location fixes that moved less than this many meters since the last kept one")
+ap.add_argument("--location-heartbeat", type=float, default=300.0,
+                help="keep a fix inside the dead-band anyway after this many seconds")
 args = vars(ap.parse_args())
+replay_mode = bool(args.get("input"))
 
 EYE_AR_THRESH = 0.3
-EYE_AR_CONSEC_FRAMES = 30
 YAWN_THRESH = 20
 alarm_status = False
 alarm_status2 = False
 saying = False
-COUNTER = 0
+# alert timing is in seconds of capture time, so latency does not depend on the frame rate;
+# each face gets its own timers and only the driver's face raises alerts
+selector = DriverSelector(args["extra_faces"], args["extra_face_every"], anchor_x=args["driver_x"],
+                          alert_kwargs=dict(ear_thresh=EYE_AR_THRESH, closed_seconds=args["eye_closed_seconds"],
+                                            yawn_thresh=YAWN_THRESH, yawn_seconds=args["yawn_seconds"],
+                                            yawn_rearm_seconds=args["yawn_rearm_seconds"],
+                                            stats_window=args["perclos_window"]))
+sampler = LandmarkSampler(args["landmark_every"], EYE_AR_THRESH, YAWN_THRESH)
+# optional raw landmark/EAR recording for offline threshold tuning; live
+# samples are stored in Unix time, replayed ones in seconds of video
+recorder = LandmarkRecorder(args["record"], args["record_rows"],
+                            ts_offset=0.0 if replay_mode else wall_clock_offset()) if args["record"] else None
 
-print("-> Loading the predictor and detector...")
-#detector = dlib.get_frontal_face_detector()
-detector = cv2.CascadeClassifier("haarcascade_frontalface_default.xml")    #Faster but less accurate
 predictor_path = args.get("shape_predictor") or 'shape_predictor_68_face_landmarks.dat'
 if not os.path.exists(predictor_path):
     raise FileNotFoundError(f"Shape predictor file not found: {predictor_path}")
-predictor = dlib.shape_predictor(predictor_path)
-
-
-def send_alert_to_server(driver_id: str, lat: float, lon: float, status: str):
+governor = QualityGovernor(args["target_fps"]) if args["target_fps"] and not replay_mode else None
+startup['setup_ms'] = (time.perf_counter() - _startup_t0) * 1000.0 - startup['imports_ms']
+
+capture_proc = None
+if not replay_mode and args["capture_process"] and "fork" not in mp.get_all_start_methods():
+    # the capture process must not re-run this script's module-level code
+    print("Warning: --capture-process needs the 'fork' start method; using a capture thread instead")
+    args["capture_process"] = False
+
+if not replay_mode and args["capture_process"]:
+    print("-> Starting capture process")
+    ring = FrameRing(slots=args["ring_slots"], max_shape=(450, 450, 3))
+    fork_ctx = mp.get_context("fork")
+    capture_stop = fork_ctx.Event()
+    capture_proc = fork_ctx.Process(
+        target=capture_into_ring, args=(ring.spec(), args["webcam"], 450, capture_stop), daemon=True)
+    capture_proc.start()
+    grabber = RingReader(ring).start()
+
+# the models load on a background thread while the camera opens; the capture
+# process (if any) is forked first so it does not inherit a half-loaded model
+print("-> Loading the predictor and detector...")
+# haar: fastest; hog: dlib HOG, slower but more accurate; roi: cascade on a downscaled region around the last faces
+wait_for_models = model_registry.load_in_background(args["detector"], predictor_path)
+camera_t0 = time.perf_counter()
+if not replay_mode and not args["capture_process"]:
+    print("-> Starting Video Stream")
+    # Prefer explicit VideoCapture on Windows so we can select a working backend (DirectShow)
+    if os.name == 'nt':
+        cap = cv2.VideoCapture(args["webcam"], cv2.CAP_DSHOW)
+    else:
+        cap = cv2.VideoCapture(args["webcam"])
+
+    if not cap.isOpened():
+        # fallback to imutils VideoStream if cv2 backend fails
+        print("Warning: cv2.VideoCapture failed to open camera, falling back to imutils.VideoStream")
+        from imutils.video import VideoStream
+        vs = VideoStream(src=args["webcam"]).start()
+        use_cap = False
+        # vs.read() returns its latest frame without blocking; the grabber skips repeats
+        grabber = FrameGrabber(vs.read).start()
+    else:
+        use_cap = True
+        if governor:
+            # capture close to the processing size so the per-frame resize disappears;
+            # requested once for level 0 only, since changing the mode later means
+            # reconfiguring the camera under the grabber thread and stalling the stream
+            w, h = request_capture_size(cap, governor.width)
+            print(f"-> Camera capture size {w}x{h} (processing width {governor.width})")
+        # read on a separate thread so slow analysis never queues stale frames
+        grabber = FrameGrabber(cap_reader(cap)).start()
+startup['camera_open_ms'] = (time.perf_counter() - camera_t0) * 1000.0
+models_wait_t0 = time.perf_counter()
+detector, predictor, startup['models_ms'] = wait_for_models()
+startup['models_wait_ms'] = (time.perf_counter() - models_wait_t0) * 1000.0
+tracker = FaceTracker(detector, detect_every=args["detect_every"], min_iou=args["track_min_iou"])
+if governor:
+    governor.apply(tracker)
+
+# per-stage timings, FPS and alert latency; served on the local HTTP port at /metrics
+metrics = Metrics()
+stage_timer = StageTimer(metrics)
+metrics.add_collector('faces', lambda: {k: v for k, v in tracker.stats().items() if k != 'redetect_reasons'})
+metrics.add_collector('landmarks', sampler.stats)
+metrics.add_collector('driver', selector.stats)
+metrics.add_collector('eyes', lambda: selector.primary.alert.eyes.stats() if selector.primary else {})
+if recorder is not None:
+    metrics.add_collector('recorder', recorder.stats)
+if governor:
+    metrics.add_collector('governor', governor.stats)
+metrics.add_collector('startup', lambda: dict(startup))
+
+# alerts are posted by a background sender so the frame loop never waits on the network
+alert_sender = AlertSender(spool_path=args.get("alert_spool") or None,
+                           on_sent=lambda seconds: metrics.observe('alert_dispatch', seconds))
+metrics.add_collector('alerts', alert_sender.stats)
+if not replay_mode:
+    alert_sender.start()
+features = FaceFeatures()
+
+
+def send_alert_to_server(driver_id: str, lat: float, lon: float, status: str, eye_stats: dict = None):
     url = args.get("server")
     # Ensure we have numeric latitude/longitude before sending.
     lat_final = lat
@@ -153,20 +275,24 @@ def send_alert_to_server(driver_id: str, lat: float, lon: float, status: str):
         "longitude": lon_final,
         "location_unknown": location_unknown,
         "status": status,
+        # when the alert fired; it may be delivered later if the link is down
+        "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
     }
-    try:
-        resp = requests.post(url, json=payload, timeout=5)
-        print(f"POST {url} -> {resp.status_code}: {resp.text}")
-    except Exception as e:
-        print(f"Failed to POST alert to {url}: {e}")
+    if eye_stats:
+        # sliding-window PERCLOS (0..1) and blink rate of the driver at alert time
+        payload["perclos"] = round(eye_stats["perclos"], 4)
+        payload["blinks_per_min"] = round(eye_stats["blinks_per_min"], 1)
+    alert_sender.submit(url, payload)
+    if location_uplink is not None:
+        # put the track up to the alert on the dashboard right away
+        location_uplink.flush_now()
 
 
 def _get_current_location():
     """Return current (lat, lon) preferring dynamic GPS/local updates, falling back to CLI args."""
-    global current_lat, current_lon
-    with gps_lock:
-        if current_lat is not None and current_lon is not None:
-            return float(current_lat), float(current_lon)
+    fix = gps_fix.get()
+    if fix is not None:
+        return fix[0], fix[1]
     # fallback to CLI args
     try:
         lat = float(args.get('lat') or 0.0)
@@ -178,121 +304,38 @@ def _get_current_location():
     return None, None
 
 
-print("-> Starting Video Stream")
-# Prefer explicit VideoCapture on Windows so we can select a working backend (DirectShow)
-if os.name == 'nt':
-    cap = cv2.VideoCapture(args["webcam"], cv2.CAP_DSHOW)
-else:
-    cap = cv2.VideoCapture(args["webcam"])
-
-if not cap.isOpened():
-    # fallback to imutils VideoStream if cv2 backend fails
-    print("Warning: cv2.VideoCapture failed to open camera, falling back to imutils.VideoStream")
-    vs = VideoStream(src=args["webcam"]).start()
-    time.sleep(1.0)
-    use_cap = False
-else:
-    use_cap = True
-    time.sleep(1.0)
-
-
-def _server_location_url(server_api_alert: str) -> str:
-    # derive base server URL and append /api/location
-    if server_api_alert.endswith('/api/alert'):
-        return server_api_alert[:-len('/api/alert')] + '/api/location'
-    # strip trailing slash if present
-    if server_api_alert.endswith('/'):
-        return server_api_alert + 'api/location'
-    return server_api_alert + '/api/location'
-
-
-def _periodic_location_sender(driver_id: str, lat: float, lon: float, server_api_alert: str, interval: float = 5.0):
-    url = _server_location_url(server_api_alert)
-    while True:
-        # read dynamic location if available
-        lat_now, lon_now = _get_current_location()
-        payload = {
-            'driver_id': driver_id,
-            'latitude': (lat_now if lat_now is not None else lat),
-            'longitude': (lon_now if lon_now is not None else lon),
-        }
-        try:
-            resp = requests.post(url, json=payload, timeout=5)
-            # print minimal status to avoid overwhelming stdout
-            print(f"location -> {resp.status_code}", end='\r')
-        except Exception as e:
-            print(f"Failed to send location to {url}: {e}")
-        time.sleep(interval)
+# Upload locations in batches in the background (will use dynamic GPS if available)
+location_uplink = None
+if args.get('driver_id') and not replay_mode:
+    location_uplink = LocationUplink(
+        args['driver_id'], bulk_location_url(args['server']), _get_current_location,
+        sample_interval=args['location_sample'], batch_size=args['location_batch'],
+        flush_interval=args['location_flush'], deadband_m=args['location_deadband'],
+        heartbeat_s=args['location_heartbeat'])
+    metrics.add_collector('location', location_uplink.stats)
+    location_uplink.start()
 
 
-# Start periodic location updates in background (will use dynamic GPS if available)
-try:
-    driver_id_arg = args.get('driver_id')
-    lat_arg = float(args.get('lat') or 0.0)
-    lon_arg = float(args.get('lon') or 0.0)
-    server_arg = args.get('server')
-    if driver_id_arg:
-        tloc = Thread(target=_periodic_location_sender, args=(driver_id_arg, lat_arg, lon_arg, server_arg, 5.0), daemon=True)
-        tloc.start()
-except Exception:
-    pass
-
-
-# --- GPS serial reader (optional) ---
-def _gps_serial_reader(port: str, baud: int):
+# --- GPS reader (optional): serial receiver or recorded NMEA log ---
+def _gps_reader(lines):
     try:
-        import serial
-        import pynmea2
-    except Exception:
-        print("GPS serial support requires 'pyserial' and 'pynmea2' packages. Install with: pip install pyserial pynmea2")
-        return
-
-    global current_lat, current_lon
-    try:
-        ser = serial.Serial(port, baudrate=baud, timeout=1)
-        print(f"Opened GPS serial on {port} @ {baud}")
+        run_reader(lines, gps_fix, gps_stats)
+    except ImportError:
+        print("GPS serial support requires the 'pyserial' package. Install with: pip install pyserial")
     except Exception as e:
-        print(f"Failed to open GPS serial port {port}: {e}")
-        return
+        print(f"GPS reader stopped: {e}")
 
-    while True:
-        try:
-            line = ser.readline().decode('ascii', errors='ignore').strip()
-            if not line:
-                continue
-            if not line.startswith('$'):
-                continue
-            try:
-                msg = pynmea2.parse(line)
-            except Exception:
-                continue
-            # handle common sentence types that contain lat/lon
-            lat = None
-            lon = None
-            if hasattr(msg, 'latitude') and hasattr(msg, 'longitude'):
-                try:
-                    lat = float(msg.latitude)
-                    lon = float(msg.longitude)
-                except Exception:
-                    lat = None
-                    lon = None
-            if lat is not None and lon is not None and lat != 0.0 and lon != 0.0:
-                with gps_lock:
-                    current_lat = lat
-                    current_lon = lon
-                # debug
-                print(f"GPS -> {lat:.6f},{lon:.6f}")
-        except Exception as e:
-            print(f"GPS reader error: {e}")
-            time.sleep(1.0)
-
-
-# Start GPS serial reader if user provided GPS port
+
+# Start the GPS reader if user provided a GPS port or log
 try:
-    gps_port = args.get('gps_port')
-    gps_baud = int(args.get('gps_baud') or 4800)
-    if gps_port:
-        tgps = Thread(target=_gps_serial_reader, args=(gps_port, gps_baud), daemon=True)
+    gps_lines = None
+    if args.get('gps_log'):
+        gps_lines = log_lines(args['gps_log'], speed=args['gps_log_speed'])
+    elif args.get('gps_port'):
+        gps_lines = serial_lines(args['gps_port'], int(args.get('gps_baud') or 4800))
+    if gps_lines is not None and not replay_mode:
+        metrics.add_collector('gps', lambda: dict(gps_stats))
+        tgps = Thread(target=_gps_reader, args=(gps_lines,), daemon=True)
         tgps.start()
 except Exception:
     pass
@@ -300,6 +343,30 @@ except Exception:
 
 # --- Local HTTP endpoint to accept location updates from other processes ---
 class _LocationHTTPRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        # JSON by default; Prometheus text with ?format=prometheus or Accept: text/plain
+        if 'format=prometheus' in query or 'text/plain' in (self.headers.get('Accept') or ''):
+            body = metrics.to_prometheus().encode('utf-8')
+            ctype = 'text/plain; version=0.0.4'
+        else:
+            body = json.dumps(metrics.snapshot()).encode('utf-8')
+            ctype = 'application/json'
+        self.send_response(200)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # keep metrics scrapes out of the console
+        if not self.path.startswith('/metrics'):
+            super().log_message(format, *args)
+
     def do_POST(self):
         if self.path not in ('/update_location', '/location'):
             self.send_response(404)
@@ -320,12 +387,7 @@ class _LocationHTTPRequestHandler(BaseHTTPRequestHandler):
             self.end_headers()
             return
         try:
-            lat = float(lat)
-            lon = float(lon)
-            with gps_lock:
-                global current_lat, current_lon
-                current_lat = lat
-                current_lon = lon
+            gps_fix.set(float(lat), float(lon))
         except Exception:
             self.send_response(400)
             self.end_headers()
@@ -336,7 +398,7 @@ class _LocationHTTPRequestHandler(BaseHTTPRequestHandler):
 
 def _start_local_http_server(port: int):
     server = ThreadingHTTPServer(('127.0.0.1', port), _LocationHTTPRequestHandler)
-    print(f"Local location HTTP server listening on http://127.0.0.1:{port}/update_location")
+    print(f"Local location HTTP server listening on http://127.0.0.1:{port}/update_location (metrics: /metrics)")
     try:
         server.serve_forever()
     except Exception:
@@ -345,113 +407,246 @@ def _start_local_http_server(port: int):
 # run local http server if listen-port provided
 try:
     listen_port = int(args.get('listen_port') or 0)
-    if listen_port:
+    if listen_port and not replay_mode:
         th = Thread(target=_start_local_http_server, args=(listen_port,), daemon=True)
         th.start()
 except Exception:
     pass
 
-while True:
-
-    if use_cap:
-        ret, frame = cap.read()
-        if not ret or frame is None:
-            # don't crash; loop and try again
-            print("Warning: couldn't read frame from camera (ret=False). Retrying...")
-            time.sleep(0.1)
-            continue
-    else:
-        frame = vs.read()
-        if frame is None:
-            print("Warning: imutils VideoStream returned no frame. Retrying...")
-            time.sleep(0.1)
-            continue
-
-    frame = imutils.resize(frame, width=450)
+def _start_alarm():
+    if args["alarm"] != "":
+        t = Thread(target=sound_alarm,
+                   args=(args["alarm"],))
+        t.daemon = True
+        t.start()
+
+
+def _draw_readings(frame, ear, distance, eyes):
+    cv2.putText(frame, "EAR: {:.2f}".format(ear), (300, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    cv2.putText(frame, "YAWN: {:.2f}".format(distance), (300, 60),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    cv2.putText(frame, "PERCLOS: {:.0%}".format(eyes.perclos()), (300, 90),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+
+def process_frame(frame, live=True, timer=None, ts=None):
+    """Run detection and the alert logic on one frame.
+
+    ts is the frame's capture time in seconds (defaults to now). Returns the
+    resized frame and a list of (face_id, is_driver, ear, lip_distance,
+    drowsy, yawning, sampled) per analysed face; sampled is False when
+    landmarks were skipped and ear / lip_distance repeat the last sample.
+    With live=False nothing is drawn and no alarm or server alert is raised;
+    only the alert state is updated.
+    """
+    global alarm_status, alarm_status2
+    timer = timer or stage_timer
+    ts = time.monotonic() if ts is None else ts
+
+    timer.start('resize')
+    width = governor.width if governor else 450
+    if frame.shape[1] != width:
+        frame = imutils.resize(frame, width=width)
+    elif not frame.flags.writeable:
+        # shared-memory ring slot; draw on a private copy
+        frame = frame.copy()
+    timer.start('cvtColor')
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
+    timer.start('detect')
     #rects = detector(gray, 0)
-    rects = detector.detectMultiScale(gray, scaleFactor=1.1,
-		minNeighbors=5, minSize=(30, 30),
-		flags=cv2.CASCADE_SCALE_IMAGE)
+    rects = tracker.update(gray)
+
+    results = []
+    # the driver first, then any extra faces due for their low-rate pass
+    faces = selector.update(rects, gray.shape)
+    sampler.begin_frame(selector.visible_ids())
+    for face in faces:
+        primary = face is selector.primary
+        color = (0, 255, 0) if primary else (160, 160, 160)
+        if not sampler.due(face.id):
+            # eyes clearly open and mouth closed on the last sample: skip landmarks this frame
+            ear, distance = sampler.last(face.id)
+            results.append((face.id, primary, ear, distance, face.alert.drowsy, face.alert.yawning, False))
+            if live and primary:
+                timer.start('draw')
+                _draw_readings(frame, ear, distance, face.alert.eyes)
+            continue
 
-    #for rect in rects:
-    for (x, y, w, h) in rects:
+        timer.start('landmarks')
+        t0 = time.perf_counter()
+        x, y, w, h = face.rect
         rect = dlib.rectangle(int(x), int(y), int(x + w),int(y + h))
 
         shape = predictor(gray, rect)
         shape = face_utils.shape_to_np(shape)
+        tracker.observe(face.index, shape)
+        landmark_s = time.perf_counter() - t0
+
+        timer.start('features')
+        _, _, ear, distance = features(shape)
+
+        if live:
+            timer.start('draw')
+            leftEye = shape[LEFT_EYE]
+            rightEye = shape[RIGHT_EYE]
+
+            leftEyeHull = cv2.convexHull(leftEye)
+            rightEyeHull = cv2.convexHull(rightEye)
+            cv2.drawContours(frame, [leftEyeHull], -1, color, 1)
+            cv2.drawContours(frame, [rightEyeHull], -1, color, 1)
+
+            lip = shape[MOUTH]
+            cv2.drawContours(frame, [lip], -1, color, 1)
+
+        if recorder is not None:
+            timer.start('record')
+            recorder.append(ts, face.id, primary, ear, distance, shape)
+
+        timer.start('decision')
+        sampler.record(face.id, ear, distance, landmark_s)
+        # every face keeps its own timers; only the driver's raise alerts
+        raised = face.alert.update(ear, distance, ts, allow_yawn=not saying)
+        results.append((face.id, primary, ear, distance, face.alert.drowsy, face.alert.yawning, True))
+        if not primary:
+            continue
+        alarm_status = face.alert.drowsy
+        alarm_status2 = face.alert.yawning
+        if live:
+            for kind in raised:
+                _start_alarm()
+                # send the alert to backend using current location
+                try:
+                    lat_now, lon_now = _get_current_location()
+                    send_alert_to_server(args.get("driver_id"), lat_now, lon_now, kind, face.alert.eyes.stats())
+                except Exception:
+                    pass
 
-        eye = final_ear(shape)
-        ear = eye[0]
-        leftEye = eye [1]
-        rightEye = eye[2]
-
-        distance = lip_distance(shape)
-
-        leftEyeHull = cv2.convexHull(leftEye)
-        rightEyeHull = cv2.convexHull(rightEye)
-        cv2.drawContours(frame, [leftEyeHull], -1, (0, 255, 0), 1)
-        cv2.drawContours(frame, [rightEyeHull], -1, (0, 255, 0), 1)
-
-        lip = shape[48:60]
-        cv2.drawContours(frame, [lip], -1, (0, 255, 0), 1)
-
-        if ear < EYE_AR_THRESH:
-            COUNTER += 1
-
-            if COUNTER >= EYE_AR_CONSEC_FRAMES:
-                if alarm_status == False:
-                    alarm_status = True
-                    if args["alarm"] != "":
-                        t = Thread(target=sound_alarm,
-                                   args=(args["alarm"],))
-                    t.daemon = True
-                    t.start()
-
-                    # send drowsiness alert to backend using current location
-                    try:
-                        lat_now, lon_now = _get_current_location()
-                        send_alert_to_server(args.get("driver_id"), lat_now, lon_now, "drowsiness")
-                    except Exception:
-                        pass
-
+            if alarm_status:
                 cv2.putText(frame, "DROWSINESS ALERT!", (10, 30),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-
-        else:
-            COUNTER = 0
-            alarm_status = False
-
-        if (distance > YAWN_THRESH):
+            if distance > YAWN_THRESH:
                 cv2.putText(frame, "Yawn Alert", (10, 30),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                if alarm_status2 == False and saying == False:
-                    alarm_status2 = True
-                    if args["alarm"] != "":
-                        t = Thread(target=sound_alarm,
-                                   args=(args["alarm"],))
-                    t.daemon = True
-                    t.start()
-
-                    # send yawn alert to backend using current location
-                    try:
-                        lat_now, lon_now = _get_current_location()
-                        send_alert_to_server(args.get("driver_id"), lat_now, lon_now, "yawn")
-                    except Exception:
-                        pass
-        else:
-            alarm_status2 = False
 
-        cv2.putText(frame, "EAR: {:.2f}".format(ear), (300, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        cv2.putText(frame, "YAWN: {:.2f}".format(distance), (300, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            timer.start('draw')
+            _draw_readings(frame, ear, distance, face.alert.eyes)
+
+    timer.stop()
+    return frame, results
 
 
+def run_replay(path, output=None, fps=30.0):
+    """Process a recorded video or frame directory headless, as fast as possible."""
+    writer = DecisionWriter(output) if output else None
+    timer = StageTimer()
+    frames = 0
+    started = time.perf_counter()
+    source = iter_frames(path, fps=fps)
     try:
+        while True:
+            timer.start('read')
+            item = next(source, None)
+            if item is None:
+                break
+            ts, frame = item
+            _, results = process_frame(frame, live=False, timer=timer, ts=ts)
+            if writer:
+                if not results:
+                    writer.write(frames, ts, -1, None, None, alarm_status, alarm_status2)
+                for face_id, primary, ear, distance, drowsy, yawning, sampled in results:
+                    writer.write(frames, ts, face_id, ear, distance, drowsy, yawning, primary, sampled)
+            frames += 1
+    finally:
+        timer.stop()
+        if writer:
+            writer.close()
+        if recorder is not None:
+            recorder.close()
+    elapsed = time.perf_counter() - started
+    print(f"replay: {frames} frames in {elapsed:.2f}s -> {frames / elapsed if elapsed else 0.0:.1f} frames/s")
+    print("replay stages: " + timer.report(frames))
+    print(format_stats(tracker.stats(elapsed)))
+    print(format_sampler_stats(sampler.stats()))
+    print("driver: faces={faces} id={primary_id} switches={switches} extra_runs={extra_runs} "
+          "ignored={faces_ignored}".format(**selector.stats()))
+    if selector.primary:
+        print("eyes: perclos={perclos:.1%} blinks/min={blinks_per_min:.1f} over {window_s:.0f}s".format(
+            **selector.primary.alert.eyes.stats()))
+
+
+if replay_mode:
+    run_replay(args["input"], args.get("output"), fps=args["replay_fps"])
+    raise SystemExit(0)
+
+
+def _print_capture_stats():
+    st = grabber.stats()
+    print("capture: captured={frames_captured} dropped={frames_dropped} processed={frames_processed} "
+          "lag avg={lag_avg_ms:.1f}ms max={lag_max_ms:.1f}ms".format(**st))
+    print(format_stats(tracker.stats(time.monotonic() - loop_started)))
+    print(format_sampler_stats(sampler.stats()))
+    print("driver: faces={faces} id={primary_id} switches={switches} extra_runs={extra_runs} "
+          "ignored={faces_ignored}".format(**selector.stats()))
+    if selector.primary:
+        print("eyes: perclos={perclos:.1%} blinks/min={blinks_per_min:.1f} over {window_s:.0f}s".format(
+            **selector.primary.alert.eyes.stats()))
+    if governor:
+        print("governor: level={level} width={width} scaleFactor={scale_factor} minSize={min_size} "
+              "frame avg={frame_ms_avg:.1f}ms budget={budget_ms:.1f}ms changes={changes}".format(**governor.stats()))
+
+
+def _report_startup():
+    print("-> Startup: imports {imports_ms:.0f}ms, setup {setup_ms:.0f}ms, camera open {camera_open_ms:.0f}ms "
+          "(models {models_ms:.0f}ms in parallel, waited {models_wait_ms:.0f}ms), first frame wait "
+          "{first_frame_wait_ms:.0f}ms; first decision {first_decision_ms:.0f}ms after start".format(**startup))
+
+
+# wait for the camera's first frame instead of sleeping a fixed warm-up time
+first_frame_t0 = time.perf_counter()
+if not grabber.wait_ready(args["camera_timeout"]):
+    print(f"Warning: no frame from the camera after {args['camera_timeout']:.0f}s; still waiting")
+startup['first_frame_wait_ms'] = (time.perf_counter() - first_frame_t0) * 1000.0
+first_decision = True
+
+stats_interval = float(args.get('stats_interval') or 0.0)
+last_stats = time.monotonic()
+loop_started = time.monotonic()
+
+metrics.add_collector('capture', grabber.stats)
+
+while True:
+
+    stage_timer.start('capture')
+    item = grabber.read(timeout=1.0)
+    if item is None:
+        # don't crash; loop and try again
+        print("Warning: no frame from camera. Retrying...")
+        continue
+    _, captured_at, frame = item
+
+    frame_started = time.perf_counter()
+    frame, _ = process_frame(frame, ts=captured_at)
+    metrics.frame()
+    if first_decision:
+        first_decision = False
+        startup['first_decision_ms'] = (time.perf_counter() - _startup_t0) * 1000.0
+        _report_startup()
+    if governor and governor.observe(time.perf_counter() - frame_started):
+        governor.apply(tracker)
+        tracker.reset()
+
+    grabber.mark_processed(captured_at)
+    if stats_interval and time.monotonic() - last_stats >= stats_interval:
+        last_stats = time.monotonic()
+        _print_capture_stats()
+
+    try:
+      stage_timer.start('display')
       cv2.imshow("Frame", frame)
       key = cv2.waitKey(1) & 0xFF
+      stage_timer.stop()
     except cv2.error as e:
       # Common cause: OpenCV was installed without GUI support (headless build)
       print("\nERROR: cv2.imshow is not available in this OpenCV build.\n" \
@@ -469,5 +664,19 @@ while True:
     if key == ord("q"):
         break
 
+grabber.stop()
+alert_sender.stop()
+if recorder is not None:
+    recorder.close()
+if location_uplink is not None:
+    location_uplink.stop()
+_print_capture_stats()
 cv2.destroyAllWindows()
-vs.stop()
+if capture_proc is not None:
+    capture_stop.set()
+    capture_proc.join(timeout=2.0)
+    ring.close()
+elif use_cap:
+    cap.release()
+else:
+    vs.stop()
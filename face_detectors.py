@@ -0,0 +1,121 @@
+"""
+Interchangeable face detector backends.
+
+Every backend has detect(gray, scale_factor, min_neighbors, min_size) and
+returns a list of (x, y, w, h) rectangles, so FaceTracker and the quality
+governor work the same whichever one is picked:
+
+- 'haar': OpenCV Haar cascade on the full frame (the previous default).
+- 'hog':  dlib's HOG + linear SVM frontal face detector; slower, more accurate.
+- 'roi':  Haar cascade on a downscaled image, restricted to the area around
+          the last faces found, with a full-frame pass every few calls.
+
+Pick one by name with create_detector(); benchmarks/bench_detectors.py
+compares them on recorded clips.
+"""
+import cv2
+
+import model_registry
+
+
+class HaarDetector:
+    """OpenCV Haar cascade over the whole frame."""
+
+    name = 'haar'
+
+    def __init__(self, cascade=None, cascade_path=model_registry.DEFAULT_CASCADE):
+        self.cascade = cascade if cascade is not None else model_registry.get_cascade(cascade_path)
+
+    def detect(self, gray, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        rects = self.cascade.detectMultiScale(gray, scaleFactor=scale_factor, minNeighbors=min_neighbors,
+                                              minSize=min_size, flags=cv2.CASCADE_SCALE_IMAGE)
+        return [tuple(int(v) for v in r) for r in rects]
+
+
+class DlibHogDetector:
+    """dlib HOG frontal face detector; scale_factor and min_neighbors do not apply.
+
+    upsample: image pyramid upsampling passes (finds smaller faces, much slower).
+    """
+
+    name = 'hog'
+
+    def __init__(self, upsample=0):
+        self.detector = model_registry.get_hog_detector()
+        self.upsample = upsample
+
+    def detect(self, gray, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        out = []
+        for r in self.detector(gray, self.upsample):
+            x, y = max(0, r.left()), max(0, r.top())
+            w, h = r.right() - x, r.bottom() - y
+            if w >= min_size[0] and h >= min_size[1]:
+                out.append((x, y, w, h))
+        return out
+
+
+class RoiCascadeDetector:
+    """Haar cascade on a downscaled region around the last known faces.
+
+    downscale: factor applied to the search region before the cascade runs.
+    margin: how far (in face widths) the region extends around the last faces.
+    full_every: search the whole frame at least every N calls, and whenever
+        the previous call found nothing.
+    """
+
+    name = 'roi'
+
+    def __init__(self, cascade=None, cascade_path=model_registry.DEFAULT_CASCADE, downscale=0.5,
+                 margin=0.5, full_every=10):
+        self.cascade = cascade if cascade is not None else model_registry.get_cascade(cascade_path)
+        self.downscale = downscale
+        self.margin = margin
+        self.full_every = max(1, int(full_every))
+        self._last = []
+        self._shape = None
+        self._calls = 0
+
+    def _region(self, fh, fw):
+        x0 = min(x for x, _, _, _ in self._last)
+        y0 = min(y for _, y, _, _ in self._last)
+        x1 = max(x + w for x, _, w, _ in self._last)
+        y1 = max(y + h for _, y, _, h in self._last)
+        pad = int(self.margin * max(w for _, _, w, _ in self._last))
+        return max(0, x0 - pad), max(0, y0 - pad), min(fw, x1 + pad), min(fh, y1 + pad)
+
+    def detect(self, gray, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        fh, fw = gray.shape[:2]
+        if gray.shape != self._shape:
+            # resolution changed (e.g. the governor stepped); old boxes are meaningless
+            self._last = []
+            self._shape = gray.shape
+        self._calls += 1
+        if self._last and self._calls % self.full_every:
+            x0, y0, x1, y1 = self._region(fh, fw)
+        else:
+            x0, y0, x1, y1 = 0, 0, fw, fh
+        roi = gray[y0:y1, x0:x1]
+        s = self.downscale
+        if s != 1.0:
+            roi = cv2.resize(roi, None, fx=s, fy=s, interpolation=cv2.INTER_AREA)
+        small_min = (max(10, int(min_size[0] * s)), max(10, int(min_size[1] * s)))
+        rects = self.cascade.detectMultiScale(roi, scaleFactor=scale_factor, minNeighbors=min_neighbors,
+                                              minSize=small_min, flags=cv2.CASCADE_SCALE_IMAGE)
+        self._last = [(x0 + int(x / s), y0 + int(y / s), int(w / s), int(h / s)) for x, y, w, h in rects]
+        return list(self._last)
+
+
+BACKENDS = {
+    'haar': HaarDetector,
+    'hog': DlibHogDetector,
+    'roi': RoiCascadeDetector,
+}
+
+
+def create_detector(name='haar', **kwargs):
+    """Build the backend called `name` ('haar', 'hog' or 'roi')."""
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown face detector {name!r}; choose from {', '.join(BACKENDS)}") from None
+    return cls(**kwargs)
@@ -0,0 +1,153 @@
+"""
+Detect-then-track face localisation.
+
+Running the Haar cascade over the whole frame is the most expensive step of the
+detection loop, while a driver's head barely moves between frames. FaceTracker
+runs the cascade only every `detect_every` frames (or when tracking looks
+unreliable) and, in between, derives each face rectangle from the 68 landmarks
+the predictor returned for the previous frame.
+"""
+import time
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) rectangles."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class _Track:
+    __slots__ = ('rect', 'calib')
+
+    def __init__(self, rect):
+        self.rect = rect
+        # (dx, dy, sw, sh) mapping the landmark bounding box onto the cascade box;
+        # learned on the first landmark pass after a detection
+        self.calib = None
+
+
+class FaceTracker:
+    """Return face rectangles (x, y, w, h), running the cascade only when needed.
+
+    detector: a face_detectors backend (or a cv2.CascadeClassifier).
+    detect_every: run the cascade at least every N frames (1 = every frame).
+    min_iou: re-detect when the landmark-derived box disagrees with the box the
+        predictor was run on by more than this (IoU below threshold).
+    redetect_on_empty: keep running the cascade every frame while no face is found.
+    """
+
+    def __init__(self, detector, detect_every=5, min_iou=0.5, redetect_on_empty=True,
+                 scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        if not hasattr(detector, 'detect'):
+            # a bare cv2.CascadeClassifier
+            from face_detectors import HaarDetector
+            detector = HaarDetector(detector)
+        self.detector = detector
+        self.detect_every = max(1, int(detect_every))
+        self.min_iou = float(min_iou)
+        self.redetect_on_empty = redetect_on_empty
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+        self._tracks = []
+        self._since_detect = 0
+        self._force = True
+        self._shape = None
+
+        self.frames = 0
+        self.detections = 0
+        self.tracked = 0
+        self.redetect_reasons = {'cadence': 0, 'low_iou': 0, 'out_of_frame': 0}
+        self._detect_time = 0.0
+        self._track_time = 0.0
+
+    def _detect(self, gray):
+        t0 = time.perf_counter()
+        rects = self.detector.detect(gray, self.scale_factor, self.min_neighbors, self.min_size)
+        self._detect_time += time.perf_counter() - t0
+        self.detections += 1
+        self._tracks = [_Track(r) for r in rects]
+        self._since_detect = 0
+        self._force = self.redetect_on_empty and not self._tracks
+
+    def reset(self):
+        """Drop tracked faces and run the cascade on the next frame (e.g. after a resolution change)."""
+        self._tracks = []
+        self._force = True
+
+    def update(self, gray):
+        """Return the face rectangles to run the landmark predictor on for this frame."""
+        self.frames += 1
+        self._shape = gray.shape[:2]
+        if self._force:
+            self._detect(gray)
+        elif self._since_detect + 1 >= self.detect_every:
+            self.redetect_reasons['cadence'] += 1
+            self._detect(gray)
+        else:
+            self._since_detect += 1
+            self.tracked += 1
+        return [t.rect for t in self._tracks]
+
+    def observe(self, index, shape):
+        """Feed back the (68, 2) landmarks found inside rectangle `index`.
+
+        Updates that face's rectangle for the next frame and schedules a
+        re-detection when the landmarks no longer fit the tracked box.
+        """
+        t0 = time.perf_counter()
+        track = self._tracks[index]
+        x0, y0 = shape.min(axis=0)
+        x1, y1 = shape.max(axis=0)
+        lw = max(1, int(x1 - x0))
+        lh = max(1, int(y1 - y0))
+        x, y, w, h = track.rect
+        if track.calib is None:
+            track.calib = ((x - x0) / lw, (y - y0) / lh, w / lw, h / lh)
+        dx, dy, sw, sh = track.calib
+        new = (int(round(x0 + dx * lw)), int(round(y0 + dy * lh)),
+               int(round(sw * lw)), int(round(sh * lh)))
+
+        if iou(new, track.rect) < self.min_iou:
+            self.redetect_reasons['low_iou'] += 1
+            self._force = True
+        elif self._shape is not None:
+            fh, fw = self._shape
+            if new[0] < 0 or new[1] < 0 or new[0] + new[2] > fw or new[1] + new[3] > fh:
+                self.redetect_reasons['out_of_frame'] += 1
+                self._force = True
+        track.rect = new
+        self._track_time += time.perf_counter() - t0
+
+    def stats(self, elapsed=None):
+        """Counters plus, given the loop's elapsed seconds, measured vs. every-frame FPS."""
+        avg_detect = self._detect_time / self.detections if self.detections else 0.0
+        out = {
+            'frames': self.frames,
+            'detections': self.detections,
+            'tracked': self.tracked,
+            'redetect_reasons': dict(self.redetect_reasons),
+            'detect_ms_avg': avg_detect * 1000.0,
+            'track_ms_total': self._track_time * 1000.0,
+        }
+        if elapsed and self.frames:
+            # estimate what the loop would have cost with a cascade on every frame
+            baseline = elapsed + self.tracked * avg_detect - self._track_time
+            out['fps'] = self.frames / elapsed
+            out['fps_detect_every_frame'] = self.frames / baseline if baseline > 0 else 0.0
+            out['fps_gain'] = out['fps'] / out['fps_detect_every_frame'] if out['fps_detect_every_frame'] else 0.0
+        return out
+
+
+def format_stats(st):
+    line = ("faces: frames={frames} detections={detections} tracked={tracked} "
+            "detect avg={detect_ms_avg:.1f}ms".format(**st))
+    if 'fps' in st:
+        line += " fps={fps:.1f} (every-frame est {fps_detect_every_frame:.1f}, x{fps_gain:.2f})".format(**st)
+    return line
@@ -0,0 +1,85 @@
+"""
+Vectorized eye/mouth features from 68-point facial landmarks.
+
+FaceFeatures computes left/right eye aspect ratio (EAR), their mean and the lip
+distance in one pass over precomputed index arrays. Single-frame calls reuse
+preallocated buffers, so the per-frame hot path does no array allocation and
+needs no SciPy.
+
+Landmark layout follows imutils.face_utils.FACIAL_LANDMARKS_IDXS.
+"""
+import numpy as np
+
+# slices into the (68, 2) landmark array, also used for drawing the hulls
+LEFT_EYE = slice(42, 48)
+RIGHT_EYE = slice(36, 42)
+MOUTH = slice(48, 60)
+
+# EAR = (|p1-p5| + |p2-p4|) / (2 |p0-p3|) per eye; rows 0-2 left eye, 3-5 right eye
+_EAR_A = np.array([43, 44, 42, 37, 38, 36], dtype=np.intp)
+_EAR_B = np.array([47, 46, 45, 41, 40, 39], dtype=np.intp)
+
+# lip distance = |mean(top lip y) - mean(bottom lip y)|
+_LIP_IDX = np.array([50, 51, 52, 61, 62, 63, 56, 57, 58, 65, 66, 67], dtype=np.intp)
+_LIP_W = np.array([1.0] * 6 + [-1.0] * 6) / 6.0
+
+
+class FaceFeatures:
+    """Compute (left_ear, right_ear, ear, lip_distance) from landmarks.
+
+    Instances hold scratch buffers and are not thread-safe; give each detection
+    loop its own.
+    """
+
+    def __init__(self):
+        self._pts = np.empty((68, 2), dtype=np.float64)
+        self._a = np.empty((6, 2), dtype=np.float64)
+        self._b = np.empty((6, 2), dtype=np.float64)
+        self._n = np.empty(6, dtype=np.float64)
+        self._lip = np.empty(12, dtype=np.float64)
+        self._ys = self._pts[:, 1]
+        self._batch = {}
+
+    def __call__(self, shape):
+        """Features for one (68, 2) landmark array, as Python floats."""
+        np.copyto(self._pts, shape)
+        np.take(self._pts, _EAR_A, axis=0, out=self._a, mode='clip')
+        np.take(self._pts, _EAR_B, axis=0, out=self._b, mode='clip')
+        np.subtract(self._a, self._b, out=self._a)
+        np.multiply(self._a, self._a, out=self._a)
+        np.add(self._a[:, 0], self._a[:, 1], out=self._n)
+        np.sqrt(self._n, out=self._n)
+        n = self._n
+        left = (n[0] + n[1]) / (2.0 * n[2])
+        right = (n[3] + n[4]) / (2.0 * n[5])
+
+        np.take(self._ys, _LIP_IDX, out=self._lip, mode='clip')
+        lip = abs(np.dot(_LIP_W, self._lip))
+        return float(left), float(right), float((left + right) / 2.0), float(lip)
+
+    def batch(self, shapes):
+        """Features for a stacked (N, 68, 2) array; returns four (N,) arrays.
+
+        Scratch buffers are cached per batch size, so repeated calls with the
+        same N allocate only the returned arrays (plus a float copy of integer
+        input).
+        """
+        shapes = np.asarray(shapes, dtype=np.float64)
+        count = shapes.shape[0]
+        bufs = self._batch.get(count)
+        if bufs is None:
+            bufs = (np.empty((count, 6, 2)), np.empty((count, 6, 2)), np.empty((count, 6)),
+                    np.empty((count, 12)))
+            self._batch[count] = bufs
+        a, b, n, lip = bufs
+        np.take(shapes, _EAR_A, axis=1, out=a, mode='clip')
+        np.take(shapes, _EAR_B, axis=1, out=b, mode='clip')
+        np.subtract(a, b, out=a)
+        np.multiply(a, a, out=a)
+        np.add(a[..., 0], a[..., 1], out=n)
+        np.sqrt(n, out=n)
+        left = (n[:, 0] + n[:, 1]) / (2.0 * n[:, 2])
+        right = (n[:, 3] + n[:, 4]) / (2.0 * n[:, 5])
+        np.take(shapes[:, :, 1], _LIP_IDX, axis=1, out=lip, mode='clip')
+        dist = np.abs(lip @ _LIP_W)
+        return left, right, (left + right) / 2.0, dist
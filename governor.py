@@ -0,0 +1,98 @@
+"""
+Adaptive quality governor for the detection loops.
+
+QualityGovernor measures per-frame processing time against a frame budget
+(1 / target_fps) and walks a ladder of quality levels: processing width,
+cascade scaleFactor and minimum face size. It steps down when the smoothed
+frame time exceeds the budget and back up when there is clear headroom. Every
+change is logged with the measured frame time so settings can be tuned per
+hardware SKU.
+"""
+
+# best quality first; each step trades detection detail for speed
+DEFAULT_LEVELS = (
+    {'width': 450, 'scale_factor': 1.1, 'min_size': 30},
+    {'width': 400, 'scale_factor': 1.15, 'min_size': 30},
+    {'width': 360, 'scale_factor': 1.2, 'min_size': 36},
+    {'width': 320, 'scale_factor': 1.25, 'min_size': 40},
+    {'width': 280, 'scale_factor': 1.3, 'min_size': 40},
+)
+
+
+class QualityGovernor:
+    """Pick processing settings that keep frame time within 1 / target_fps.
+
+    window: frames to observe after a change before deciding again.
+    headroom: step back up only when the smoothed frame time is below
+        headroom * budget (hysteresis, avoids oscillating between levels).
+    """
+
+    def __init__(self, target_fps=15.0, levels=DEFAULT_LEVELS, window=30, headroom=0.7, start_level=0, log=print):
+        self.target_fps = float(target_fps)
+        self.budget = 1.0 / self.target_fps
+        self.levels = tuple(levels)
+        self.window = max(1, int(window))
+        self.headroom = float(headroom)
+        self.level = min(max(0, int(start_level)), len(self.levels) - 1)
+        self._log = log
+        self._alpha = 2.0 / (self.window + 1)
+        self._ema = None
+        self._since_change = 0
+        self.changes = 0
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    @property
+    def width(self):
+        return self.settings['width']
+
+    @property
+    def scale_factor(self):
+        return self.settings['scale_factor']
+
+    @property
+    def min_size(self):
+        m = self.settings['min_size']
+        return (m, m)
+
+    def observe(self, frame_seconds):
+        """Record one frame's processing time; returns True if the level changed."""
+        self._ema = frame_seconds if self._ema is None else self._ema + self._alpha * (frame_seconds - self._ema)
+        self._since_change += 1
+        if self._since_change < self.window:
+            return False
+        new_level = self.level
+        if self._ema > self.budget and self.level < len(self.levels) - 1:
+            new_level = self.level + 1
+        elif self._ema < self.budget * self.headroom and self.level > 0:
+            new_level = self.level - 1
+        if new_level == self.level:
+            return False
+        old_ms = self._ema * 1000.0
+        self.level = new_level
+        self._since_change = 0
+        self.changes += 1
+        if self._log:
+            self._log("governor: level {} width={width} scaleFactor={scale_factor} minSize={min_size} "
+                      "(frame {:.1f}ms, budget {:.1f}ms @ {:.0f} fps)".format(
+                          self.level, old_ms, self.budget * 1000.0, self.target_fps, **self.settings))
+        return True
+
+    def apply(self, tracker):
+        """Push the current cascade settings into a face_tracking.FaceTracker."""
+        tracker.scale_factor = self.scale_factor
+        tracker.min_size = self.min_size
+
+    def stats(self):
+        out = dict(self.settings)
+        out.update({
+            'level': self.level,
+            'target_fps': self.target_fps,
+            'budget_ms': self.budget * 1000.0,
+            'frame_ms_avg': (self._ema or 0.0) * 1000.0,
+            'changes': self.changes,
+        })
+        return out
+
@@ -0,0 +1,144 @@
+"""
+Batched, dead-banded location uplink from the detector to the backend.
+
+LocationUplink samples the current position, drops fixes that moved less than
+`deadband_m` since the last kept fix (unless `heartbeat_s` has passed, so a
+parked vehicle still reports now and then), and uploads the kept fixes in
+batches to POST /api/locations/bulk over a persistent HTTP session. A batch
+goes out when it reaches `batch_size`, when `flush_interval` has elapsed, or
+immediately when flush_now() is called (e.g. because an alert fired).
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from backend.utils.distance import haversine_km
+
+
+def bulk_location_url(server_api_alert: str) -> str:
+    """Derive the bulk location endpoint from the configured /api/alert URL."""
+    if server_api_alert.endswith('/api/alert'):
+        return server_api_alert[:-len('/api/alert')] + '/api/locations/bulk'
+    return server_api_alert.rstrip('/') + '/api/locations/bulk'
+
+
+class LocationUplink:
+    """Sample get_location() every `sample_interval` seconds and upload in batches.
+
+    get_location: callable returning (lat, lon); None values skip the sample.
+    max_buffer: fixes kept while the server is unreachable (oldest dropped).
+    """
+
+    def __init__(self, driver_id, url, get_location, sample_interval=1.0, batch_size=20,
+                 flush_interval=30.0, deadband_m=25.0, heartbeat_s=300.0, max_buffer=1000, timeout=5.0):
+        self.driver_id = driver_id
+        self.url = url
+        self.get_location = get_location
+        self.sample_interval = sample_interval
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.deadband_m = deadband_m
+        self.heartbeat_s = heartbeat_s
+        self.timeout = timeout
+        self._buffer = deque(maxlen=max_buffer)
+        self._last_kept = None
+        self._last_flush = time.monotonic()
+        self._wake = threading.Event()
+        self._flush_requested = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._session = None
+
+        self.samples = 0
+        self.suppressed = 0
+        self.uploaded = 0
+        self.batches = 0
+        self.failures = 0
+
+    def add_fix(self, lat, lon, ts=None):
+        """Buffer a fix unless it falls inside the dead-band; returns True if kept."""
+        ts = time.time() if ts is None else ts
+        self.samples += 1
+        if self._last_kept is not None:
+            lat0, lon0, ts0 = self._last_kept
+            moved_m = haversine_km(lat0, lon0, lat, lon) * 1000.0
+            if moved_m < self.deadband_m and ts - ts0 < self.heartbeat_s:
+                self.suppressed += 1
+                return False
+        self._last_kept = (lat, lon, ts)
+        self._buffer.append({
+            'latitude': lat,
+            'longitude': lon,
+            'timestamp': datetime.fromtimestamp(ts, timezone.utc).isoformat().replace('+00:00', 'Z'),
+        })
+        return True
+
+    def flush_now(self):
+        """Upload buffered fixes (plus the current position) as soon as possible."""
+        self._flush_requested = True
+        self._wake.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='location-uplink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def stats(self):
+        return {
+            'samples': self.samples,
+            'suppressed': self.suppressed,
+            'buffered': len(self._buffer),
+            'uploaded': self.uploaded,
+            'batches': self.batches,
+            'failures': self.failures,
+        }
+
+    def _run(self):
+        import requests
+        # imported on this thread so it stays off the detector's startup path
+        self._session = requests.Session()
+        while not self._stop.is_set():
+            forced = self._flush_requested
+            self._flush_requested = False
+            lat, lon = self.get_location()
+            if lat is not None and lon is not None:
+                if forced:
+                    # an alert wants the freshest position regardless of the dead-band
+                    self._last_kept = None
+                self.add_fix(float(lat), float(lon))
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+            if self._buffer and (forced or due or len(self._buffer) >= self.batch_size):
+                self._flush()
+            self._wake.wait(self.sample_interval)
+            self._wake.clear()
+        if self._buffer:
+            self._flush()
+
+    def _flush(self):
+        import requests
+        batch = list(self._buffer)
+        try:
+            resp = self._session.post(self.url, json={'driver_id': self.driver_id, 'locations': batch},
+                                      timeout=self.timeout)
+            ok = resp.status_code < 300
+            # print minimal status to avoid overwhelming stdout
+            print(f"location batch ({len(batch)}) -> {resp.status_code}", end='\r')
+        except requests.RequestException as e:
+            ok = False
+            print(f"Failed to send locations to {self.url}: {e}")
+        self._last_flush = time.monotonic()
+        if not ok:
+            self.failures += 1
+            return
+        for _ in range(len(batch)):
+            self._buffer.popleft()
+        self.uploaded += len(batch)
+        self.batches += 1
@@ -0,0 +1,155 @@
+"""
+Lightweight runtime metrics for the detection loop.
+
+Recording is O(1) (a perf_counter call and a list store per stage), so the
+timers can stay on in production; percentiles are only computed when someone
+reads the metrics, e.g. through the local /metrics endpoint.
+
+Metrics holds rolling per-stage histograms (p50/p95/p99), counters, and
+collectors: callables returning a dict of numbers (capture stats, tracker
+stats, ...) that are merged in at scrape time.
+"""
+import threading
+import time
+
+
+class RollingHistogram:
+    """Keep the last `size` samples and report percentiles over them."""
+
+    __slots__ = ('_buf', '_size', '_n', 'count', 'total')
+
+    def __init__(self, size=512):
+        self._buf = [0.0] * size
+        self._size = size
+        self._n = 0
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self._buf[self._n % self._size] = value
+        self._n += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self):
+        n = min(self._n, self._size)
+        if not n:
+            return {'count': self.count, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        vals = sorted(self._buf[:n])
+
+        def pct(p):
+            return vals[min(n - 1, int(p * n))]
+
+        return {
+            'count': self.count,
+            'mean': sum(vals) / n,
+            'p50': pct(0.50),
+            'p95': pct(0.95),
+            'p99': pct(0.99),
+            'max': vals[-1],
+        }
+
+
+class Metrics:
+    """Registry of stage histograms (recorded in ms), counters and collectors."""
+
+    def __init__(self, window=512):
+        self._window = window
+        self.stages = {}
+        self.counters = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+        self._frame_times = RollingHistogram(window)
+        self._last_frame = None
+
+    def observe(self, stage, seconds):
+        h = self.stages.get(stage)
+        if h is None:
+            with self._lock:
+                h = self.stages.setdefault(stage, RollingHistogram(self._window))
+        h.add(seconds * 1000.0)
+
+    def inc(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def frame(self):
+        """Mark the end of one processed frame (drives the FPS figure)."""
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            self._frame_times.add(now - self._last_frame)
+        self._last_frame = now
+        self.inc('frames_processed')
+
+    def fps(self):
+        snap = self._frame_times.snapshot()
+        return 1.0 / snap['mean'] if snap['mean'] else 0.0
+
+    def add_collector(self, name, fn):
+        self._collectors[name] = fn
+
+    def snapshot(self):
+        out = {
+            'fps': self.fps(),
+            'stages_ms': {k: h.snapshot() for k, h in list(self.stages.items())},
+            'counters': dict(self.counters),
+        }
+        for name, fn in list(self._collectors.items()):
+            try:
+                out[name] = fn()
+            except Exception as e:
+                out[name] = {'error': str(e)}
+        return out
+
+    def to_prometheus(self, prefix='drowsiness_'):
+        """Render snapshot() in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = [f"# TYPE {prefix}fps gauge", f"{prefix}fps {snap['fps']:.3f}"]
+        lines.append(f"# TYPE {prefix}stage_ms summary")
+        for stage, s in snap['stages_ms'].items():
+            for q in ('p50', 'p95', 'p99'):
+                lines.append(f'{prefix}stage_ms{{stage="{stage}",quantile="0.{q[1:]}"}} {s[q]:.3f}')
+            lines.append(f'{prefix}stage_ms_count{{stage="{stage}"}} {s["count"]}')
+        for name, value in snap['counters'].items():
+            lines.append(f"# TYPE {prefix}{name} counter")
+            lines.append(f"{prefix}{name} {value}")
+        for section, values in snap.items():
+            if section in ('fps', 'stages_ms', 'counters') or not isinstance(values, dict):
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    lines.append(f"{prefix}{section}_{key} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """Time consecutive pipeline stages: start('a') ... start('b') ... stop().
+
+    Each finished stage is recorded into `metrics` (if given) and summed in
+    `totals` for end-of-run reports.
+    """
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.totals = {}
+        self._t = None
+        self._stage = None
+
+    def start(self, stage):
+        now = time.perf_counter()
+        if self._stage is not None:
+            elapsed = now - self._t
+            self.totals[self._stage] = self.totals.get(self._stage, 0.0) + elapsed
+            if self.metrics is not None:
+                self.metrics.observe(self._stage, elapsed)
+        self._stage = stage
+        self._t = now
+
+    def stop(self):
+        self.start(None)
+
+    def report(self, frames):
+        if not frames:
+            return ''
+        return ' '.join(f"{k}={v / frames * 1000.0:.2f}ms" for k, v in self.totals.items())
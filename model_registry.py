@@ -0,0 +1,102 @@
+"""
+Process-wide cache for the detection models.
+
+The dlib 68-point shape predictor is ~100 MB and takes seconds to load, so it
+is loaded once per process and handed out to every detection session. Loading
+in the parent before DetectorPool forks its workers lets them share the model
+pages copy-on-write instead of reading the file again.
+"""
+import os
+import threading
+import time
+
+DEFAULT_PREDICTOR = 'shape_predictor_68_face_landmarks.dat'
+DEFAULT_CASCADE = 'haarcascade_frontalface_default.xml'
+
+_models = {}
+_load_ms = {}
+_lock = threading.Lock()
+
+
+def _get(kind, path, loader):
+    key = (kind, os.path.abspath(path))
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"{kind} file not found: {path}")
+            t0 = time.perf_counter()
+            model = loader(path)
+            _load_ms[key] = (time.perf_counter() - t0) * 1000.0
+            _models[key] = model
+    return model
+
+
+def get_predictor(path=DEFAULT_PREDICTOR):
+    import dlib
+    return _get('shape predictor', path, dlib.shape_predictor)
+
+
+def get_cascade(path=DEFAULT_CASCADE):
+    import cv2
+    return _get('cascade', path, cv2.CascadeClassifier)
+
+
+def get_hog_detector():
+    """dlib's HOG frontal face detector (built in, no model file)."""
+    import dlib
+    model = _models.get(('hog detector', ''))
+    if model is None:
+        with _lock:
+            model = _models.get(('hog detector', ''))
+            if model is None:
+                t0 = time.perf_counter()
+                model = dlib.get_frontal_face_detector()
+                _load_ms[('hog detector', '')] = (time.perf_counter() - t0) * 1000.0
+                _models[('hog detector', '')] = model
+    return model
+
+
+def load_in_background(detector='haar', predictor_path=DEFAULT_PREDICTOR):
+    """Start building the face detector and loading the predictor on a thread.
+
+    Returns a function that waits for both and returns (detector, predictor,
+    load_ms), re-raising any load error, so the caller can open the camera
+    while the models load.
+    """
+    result = {}
+
+    def _load():
+        t0 = time.perf_counter()
+        try:
+            from face_detectors import create_detector
+            result['models'] = (create_detector(detector), get_predictor(predictor_path))
+        except BaseException as e:
+            result['error'] = e
+        result['ms'] = (time.perf_counter() - t0) * 1000.0
+
+    thread = threading.Thread(target=_load, name='model-loader', daemon=True)
+    thread.start()
+
+    def wait():
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return result['models'] + (result['ms'],)
+    return wait
+
+
+def prewarm(predictor_path=DEFAULT_PREDICTOR, cascade_path=DEFAULT_CASCADE):
+    """Load both models now (e.g. at server startup); returns load times in ms."""
+    t0 = time.perf_counter()
+    get_cascade(cascade_path)
+    get_predictor(predictor_path)
+    return {'total_ms': (time.perf_counter() - t0) * 1000.0, 'models': loaded()}
+
+
+def loaded():
+    """{'kind:path': load_ms} for every model cached in this process."""
+    return {f"{kind}:{path}": ms for (kind, path), ms in _load_ms.items()}
@@ -0,0 +1,166 @@
+"""
+Minimal NMEA 0183 support for the detector's GPS input.
+
+Only the sentences that carry a position are decoded (GGA and RMC, from any
+talker: GP, GN, GL, ...). Lines are parsed as bytes straight from the serial
+port, checksums are verified, and everything else is skipped with a cheap
+prefix test, so a 10 Hz receiver costs next to nothing on a small board.
+
+Fixes are handed to readers through LatestFix, which swaps one immutable tuple
+instead of taking a lock per sentence. Lines can come from a serial port
+(serial_lines) or from a recorded log (log_lines), which replays at real time,
+accelerated, or as fast as possible for load tests without a device.
+"""
+import time
+
+_POSITION_TYPES = (b'GGA', b'RMC')
+
+
+def checksum_ok(line):
+    """True if `line` (bytes, starting with '$') carries a valid '*hh' checksum."""
+    star = line.rfind(b'*')
+    if star < 0 or len(line) < star + 3:
+        return False
+    calc = 0
+    for c in line[1:star]:
+        calc ^= c
+    try:
+        return calc == int(line[star + 1:star + 3], 16)
+    except ValueError:
+        return False
+
+
+def _coord(value, hemi, degree_digits):
+    deg = int(value[:degree_digits])
+    minutes = float(value[degree_digits:])
+    out = deg + minutes / 60.0
+    return -out if hemi in (b'S', b'W') else out
+
+
+def _utc_seconds(hhmmss):
+    if len(hhmmss) < 6:
+        return None
+    return int(hhmmss[0:2]) * 3600 + int(hhmmss[2:4]) * 60 + float(hhmmss[4:])
+
+
+def parse(line):
+    """Decode a GGA or RMC sentence into (lat, lon, utc_seconds_of_day).
+
+    Returns None for other sentences, bad checksums and sentences without a
+    valid fix. `line` is bytes with or without the trailing CR/LF.
+    """
+    line = line.strip()
+    if len(line) < 7 or line[0] != 0x24 or line[3:6] not in _POSITION_TYPES:  # 0x24 = '$'
+        return None
+    if not checksum_ok(line):
+        return None
+    f = line[1:line.rfind(b'*')].split(b',')
+    try:
+        if f[0][2:] == b'GGA':
+            # $xxGGA,time,lat,N,lon,E,quality,...
+            if not f[6] or f[6] == b'0':
+                return None
+            lat_v, lat_h, lon_v, lon_h = f[2], f[3], f[4], f[5]
+        else:
+            # $xxRMC,time,status,lat,N,lon,E,...
+            if f[2] != b'A':
+                return None
+            lat_v, lat_h, lon_v, lon_h = f[3], f[4], f[5], f[6]
+        if not lat_v or not lon_v:
+            return None
+        return _coord(lat_v, lat_h, 2), _coord(lon_v, lon_h, 3), _utc_seconds(f[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class LatestFix:
+    """Single-writer hand-off of the most recent position.
+
+    set() replaces one (lat, lon, monotonic_time) tuple; reference assignment
+    is atomic, so readers never see a torn fix and neither side locks.
+    """
+
+    __slots__ = ('_fix',)
+
+    def __init__(self):
+        self._fix = None
+
+    def set(self, lat, lon):
+        self._fix = (lat, lon, time.monotonic())
+
+    def get(self):
+        """(lat, lon, monotonic_time) of the latest fix, or None."""
+        return self._fix
+
+
+def serial_lines(port, baud=4800):
+    """Yield raw NMEA lines (bytes) from a serial port (needs pyserial)."""
+    import serial
+    ser = serial.Serial(port, baudrate=baud, timeout=1)
+    print(f"Opened GPS serial on {port} @ {baud}")
+    try:
+        while True:
+            line = ser.readline()
+            if line:
+                yield line
+    finally:
+        ser.close()
+
+
+def log_lines(path, speed=1.0, loop=False):
+    """Yield lines from a recorded NMEA log, paced by the sentence timestamps.
+
+    speed: 1.0 = real time, 10.0 = ten times faster, 0 = as fast as possible.
+    loop: start over at the end of the file (for long soak tests).
+    """
+    while True:
+        start_wall = None
+        start_utc = None
+        last_utc = None
+        wraps = 0.0
+        with open(path, 'rb') as f:
+            for line in f:
+                if speed > 0 and line[3:6] in _POSITION_TYPES:
+                    fields = line.split(b',', 2)
+                    try:
+                        utc = _utc_seconds(fields[1])
+                    except (IndexError, ValueError):
+                        utc = None
+                    if utc is not None:
+                        if last_utc is not None and utc + wraps < last_utc - 43200:
+                            wraps += 86400.0  # crossed midnight
+                        utc += wraps
+                        last_utc = utc
+                        if start_wall is None:
+                            start_wall, start_utc = time.monotonic(), utc
+                        delay = start_wall + (utc - start_utc) / speed - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                yield line
+        if not loop:
+            return
+
+
+def run_reader(lines, fix, stats=None):
+    """Parse `lines` and publish every valid position into `fix`.
+
+    stats: optional dict updated with counts of sentences, published fixes and
+    position sentences rejected for a bad checksum or no fix.
+    """
+    stats = {} if stats is None else stats
+    stats.update(sentences=0, fixes=0, rejected=0)
+    first = True
+    for line in lines:
+        stats['sentences'] += 1
+        pos = parse(line)
+        if pos is None:
+            if line[3:6] in _POSITION_TYPES:
+                stats['rejected'] += 1
+            continue
+        lat, lon, _ = pos
+        fix.set(lat, lon)
+        stats['fixes'] += 1
+        if first:
+            print(f"GPS -> first fix {lat:.6f},{lon:.6f}")
+            first = False
+    return stats
@@ -0,0 +1,107 @@
+"""
+Compact binary recorder for per-face landmark samples.
+
+Each analysed face adds one fixed-size record (timestamp, face id, driver
+flag, EAR, lip distance and the 68 landmarks as int16, 294 bytes) to a
+preallocated .npy file that is memory-mapped for writing, so the hot path is
+a single row store with no serialisation and no system call. Files rotate
+after `records_per_file` rows.
+
+The reader maps those files back read-only: open_recording() returns a
+structured array whose fields (rec['ear'], rec['landmarks'], ...) are views
+into the page cache, so hours of driving can be analysed with NumPy without
+parsing or copying anything.
+"""
+import glob
+import os
+import time
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([
+    ('ts', '<f8'),
+    ('valid', 'u1'),
+    ('face', '<i4'),
+    ('driver', 'i1'),
+    ('ear', '<f4'),
+    ('lip', '<f4'),
+    ('landmarks', '<i2', (68, 2)),
+])
+
+
+def wall_clock_offset():
+    """Seconds to add to a time.monotonic() reading to get Unix time."""
+    return time.time() - time.monotonic()
+
+
+class LandmarkRecorder:
+    """Append records to rotating memory-mapped .npy files in `directory`.
+
+    records_per_file: rows per file (default: one hour at 30 fps).
+    max_files: delete the oldest files beyond this many (0 keeps everything).
+    ts_offset: added to every ts before it is stored. Live loops time frames
+    with time.monotonic(), which restarts at every boot, so they pass
+    wall_clock_offset() and the files carry Unix time that labels can refer to.
+    Rows not written yet are all zero, including their `valid` byte, which is
+    how readers find the end of a file that was not closed cleanly.
+    """
+
+    def __init__(self, directory, records_per_file=108000, max_files=0, prefix='landmarks', ts_offset=0.0):
+        self.directory = directory
+        self.ts_offset = float(ts_offset)
+        self.records_per_file = int(records_per_file)
+        self.max_files = int(max_files)
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        self._mm = None
+        self._n = 0
+        self._seq = 0
+        self.path = None
+        self.records = 0
+        self.files = 0
+
+    def _open(self):
+        self._seq += 1
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        self.path = os.path.join(self.directory, f"{self.prefix}-{stamp}-{self._seq:04d}.npy")
+        self._mm = np.lib.format.open_memmap(self.path, mode='w+', dtype=RECORD_DTYPE,
+                                             shape=(self.records_per_file,))
+        self._n = 0
+        self.files += 1
+        if self.max_files:
+            old = sorted(glob.glob(os.path.join(self.directory, f"{self.prefix}-*.npy")))
+            for path in old[:-self.max_files]:
+                os.remove(path)
+
+    def append(self, ts, face, driver, ear, lip, landmarks):
+        if self._mm is None or self._n >= self.records_per_file:
+            self.close()
+            self._open()
+        self._mm[self._n] = (ts + self.ts_offset, 1, face, driver, ear, lip, landmarks)
+        self._n += 1
+        self.records += 1
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm = None
+
+    def stats(self):
+        return {'records': self.records, 'files': self.files}
+
+
+def open_recording(path):
+    """Map one recording file read-only; returns the written rows (no copy)."""
+    mm = np.load(path, mmap_mode='r')
+    # preallocated tail rows are still zero
+    empty = np.flatnonzero(mm['valid'] == 0)
+    return mm[:empty[0]] if empty.size else mm
+
+
+def open_recordings(directory, prefix='landmarks'):
+    """Map every recording in `directory`, oldest first (a list of arrays).
+
+    Use np.concatenate(...) when a single array is needed; that copies.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, f"{prefix}-*.npy")))
+    return [open_recording(p) for p in paths]
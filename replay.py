@@ -0,0 +1,74 @@
+"""
+Offline replay helpers for drowsiness_yawn.py.
+
+Frames come from a recorded video file or a directory of still images instead
+of a live camera, are processed as fast as the CPU allows, and every decision
+is written to a CSV file so detector changes can be regression-tested on a
+fixed corpus without a camera or GUI.
+"""
+import csv
+import os
+
+import cv2
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def iter_frames(path, fps=30.0):
+    """Yield (timestamp_s, frame) from a video file or a directory of images.
+
+    Timestamps come from the container for videos and from `fps` for image
+    directories (frames are taken in file-name order).
+    """
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTS))
+        for i, name in enumerate(names):
+            frame = cv2.imread(os.path.join(path, name))
+            if frame is None:
+                print(f"Skipping unreadable frame {name}")
+                continue
+            yield i / fps, frame
+        return
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video: {path}")
+    video_fps = cap.get(cv2.CAP_PROP_FPS) or fps
+    i = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            pos = cap.get(cv2.CAP_PROP_POS_MSEC)
+            yield (pos / 1000.0 if pos > 0 else i / video_fps), frame
+            i += 1
+    finally:
+        cap.release()
+
+
+class DecisionWriter:
+    """Write one CSV row per analysed face (or per frame with no face).
+
+    `face` is the face's stable id; `driver` marks the face picked as the driver.
+    `sampled` is 0 when landmarks were skipped for the face in that frame; its
+    ear and lip_distance then repeat the last sample and are not measurements.
+    """
+
+    FIELDS = ('frame', 'time_s', 'face', 'ear', 'lip_distance', 'drowsy_alert', 'yawn_alert', 'driver',
+              'sampled')
+
+    def __init__(self, path):
+        self._f = open(path, 'w', newline='', encoding='utf-8')
+        self._w = csv.writer(self._f)
+        self._w.writerow(self.FIELDS)
+
+    def write(self, frame_no, ts, face, ear, lip, drowsy, yawn, driver=True, sampled=True):
+        if face < 0:
+            self._w.writerow((frame_no, f"{ts:.3f}", -1, '', '', int(drowsy), int(yawn), '', ''))
+        else:
+            self._w.writerow((frame_no, f"{ts:.3f}", face, f"{ear:.4f}", f"{lip:.2f}", int(drowsy), int(yawn),
+                              int(driver), int(sampled)))
+
+    def close(self):
+        self._f.close()
@@ -0,0 +1,178 @@
+"""
+Shared-memory frame ring between a capture process and analysis processes.
+
+FrameRing is a fixed set of preallocated frame slots in one
+multiprocessing.shared_memory block. The single writer (the capture process)
+copies each frame into the next slot, overwriting the oldest, and stamps it
+with a sequence number. Readers look up the newest sequence number and use the
+slot in place, so frames never get pickled through a queue.
+
+Layout of the block: head (int64) | slot meta (slots x 4 float64: seq, ts,
+height, width) | frames (slots x max_h x max_w x channels uint8). A slot whose
+seq is -1 is being written.
+"""
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from capture import CaptureStats, request_capture_size
+
+_HEAD_BYTES = 8
+_META_COLS = 4
+
+
+class FrameRing:
+    """Overwrite-oldest ring of frame slots in shared memory.
+
+    Create it in the parent with FrameRing(slots, max_shape) and hand spec()
+    to other processes, which attach with FrameRing.attach(spec).
+    """
+
+    def __init__(self, slots=4, max_shape=(450, 450, 3), name=None, create=True):
+        self.slots = int(slots)
+        self.max_shape = tuple(int(v) for v in max_shape)
+        frame_bytes = int(np.prod(self.max_shape))
+        meta_bytes = self.slots * _META_COLS * 8
+        size = _HEAD_BYTES + meta_bytes + self.slots * frame_bytes
+        self._shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        buf = self._shm.buf
+        self._head = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self._meta = np.ndarray((self.slots, _META_COLS), dtype=np.float64, buffer=buf, offset=_HEAD_BYTES)
+        self._frames = np.ndarray((self.slots,) + self.max_shape, dtype=np.uint8, buffer=buf,
+                                  offset=_HEAD_BYTES + meta_bytes)
+        self._owner = create
+        if create:
+            self._head[0] = 0
+            self._meta[:, 0] = -1
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec['slots'], spec['max_shape'], name=spec['name'], create=False)
+
+    def spec(self):
+        return {'name': self._shm.name, 'slots': self.slots, 'max_shape': self.max_shape}
+
+    def write(self, frame, ts=None):
+        """Copy `frame` into the next slot and publish it; returns its sequence number."""
+        h, w = frame.shape[:2]
+        mh, mw = self.max_shape[:2]
+        if h > mh or w > mw:
+            raise ValueError(f"frame {w}x{h} does not fit ring slot {mw}x{mh}")
+        seq = int(self._head[0])
+        slot = seq % self.slots
+        meta = self._meta[slot]
+        meta[0] = -1
+        self._frames[slot, :h, :w] = frame.reshape(h, w, -1)
+        meta[1] = time.monotonic() if ts is None else ts
+        meta[2] = h
+        meta[3] = w
+        meta[0] = seq
+        self._head[0] = seq + 1
+        return seq
+
+    def latest(self, after=-1):
+        """Return (seq, ts, frame_view) for the newest frame newer than `after`, or None.
+
+        The view points into shared memory and stays valid until the writer
+        laps the ring (slots - 1 more frames); use valid(seq) to check, or copy.
+        """
+        seq = int(self._head[0]) - 1
+        if seq < 0 or seq <= after:
+            return None
+        return self.get(seq)
+
+    def get(self, seq):
+        """Return (seq, ts, frame_view) for a specific sequence number, or None
+        if it has not been published yet or was already overwritten."""
+        slot = seq % self.slots
+        meta = self._meta[slot]
+        if int(meta[0]) != seq:
+            return None
+        ts, h, w = float(meta[1]), int(meta[2]), int(meta[3])
+        frame = self._frames[slot, :h, :w]
+        if self.max_shape[2:] == (1,):
+            frame = frame[:, :, 0]
+        # readers must not draw into the shared slot
+        frame.flags.writeable = False
+        return seq, ts, frame
+
+    def valid(self, seq):
+        return int(self._meta[seq % self.slots, 0]) == seq
+
+    def close(self):
+        # drop numpy views before closing the mapping
+        self._head = self._meta = self._frames = None
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class RingReader(CaptureStats):
+    """FrameGrabber-compatible reader over a FrameRing.
+
+    read() returns (seq, captured_at, frame) for the newest unseen frame;
+    frames skipped because a newer one was already published count as dropped.
+    """
+
+    def __init__(self, ring, poll_interval=0.002):
+        super().__init__()
+        self.ring = ring
+        self._poll = poll_interval
+        self._last = -1
+
+    def start(self):
+        return self
+
+    def wait_ready(self, timeout=5.0):
+        """Block until the capture process has published a frame; False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.ring.latest(self._last) is None:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self._poll)
+        return True
+
+    def read(self, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            item = self.ring.latest(self._last)
+            if item is not None:
+                seq = item[0]
+                self.frames_dropped += seq - self._last - 1
+                self.frames_captured = seq + 1
+                self._last = seq
+                return item
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self._poll)
+
+    def stop(self):
+        pass
+
+
+def capture_into_ring(spec, source, width, stop_event):
+    """Capture process entry point: read `source`, resize to `width`, publish to the ring."""
+    import cv2
+
+    ring = FrameRing.attach(spec)
+    cap = cv2.VideoCapture(source)
+    if isinstance(source, int):
+        request_capture_size(cap, width)
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            captured_at = time.monotonic()
+            h, w = frame.shape[:2]
+            if w != width:
+                frame = cv2.resize(frame, (width, int(h * width / float(w))), interpolation=cv2.INTER_AREA)
+            ring.write(frame, captured_at)
+    finally:
+        cap.release()
+        ring.close()
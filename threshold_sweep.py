@@ -0,0 +1,293 @@
+"""
+Sweep the alert thresholds over recorded EAR / lip-distance series.
+
+Reads the driver's samples from a replay CSV (drowsiness_yawn.py --output) or
+from landmark recordings (--record, a .npy file or directory), plus a CSV of
+labelled intervals (start,end in the same seconds as the samples: seconds of
+video for a replay CSV, Unix time for live recordings). Each file is its own
+series, so a closed-eye run never continues across files. Every
+combination of threshold and duration is evaluated with the same rules as
+detection_engine.AlertState, including the timer restart after frames where
+the driver's face was lost (seen in replay CSVs; recordings keep only the
+sampled frames, so losses there go unnoticed), but vectorised: for one threshold the
+closed-eye (or open-mouth) runs are found once, and the alert time of every
+run for every duration falls out of a single searchsorted call. Thresholds
+are spread over worker processes.
+
+For each combination the report gives precision (alerts inside a labelled
+interval), recall (intervals with at least one alert) and the latency from
+interval start to the first alert.
+
+Usage:
+    python threshold_sweep.py replay.csv --labels drowsy.csv
+    python threshold_sweep.py recordings/ --labels yawns.csv --mode yawn --out sweep.csv
+"""
+import argparse
+import csv
+import os
+import warnings
+from multiprocessing import Pool
+
+import numpy as np
+
+from detection_engine import EYE_AR_CONSEC_SECONDS, EYE_AR_THRESH, YAWN_REARM_SECONDS, YAWN_SECONDS, YAWN_THRESH
+
+_data = {}
+
+
+def _load_csv(path):
+    """(ts, ear, lip, face, breaks) of the driver's sampled rows in a replay CSV.
+
+    breaks: indices of samples taken after frames where the driver's face was
+    not detected, where AlertState restarts its timers.
+    """
+    ts, ear, lip, face, breaks = [], [], [], [], []
+    prev_frame = None
+    lost = False
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if not row.get('ear') or row.get('driver') == '0':
+                continue
+            frame = int(row['frame']) if row.get('frame') else None
+            if frame is not None and prev_frame is not None and frame > prev_frame + 1:
+                lost = True
+            prev_frame = frame
+            if row.get('sampled') == '0':
+                # landmarks skipped: the values repeat the last sample
+                continue
+            if lost:
+                breaks.append(len(ts))
+                lost = False
+            ts.append(float(row.get('time_s') or row.get('ts')))
+            ear.append(float(row['ear']))
+            lip.append(float(row.get('lip_distance') or row.get('lip')))
+            face.append(int(row.get('face') or 0))
+    return np.array(ts), np.array(ear), np.array(lip), np.array(face), np.array(breaks, dtype=np.intp)
+
+
+def load_series(path):
+    """Return (ts, ear, lip, segments, breaks) for the driver's face.
+
+    ts, ear and lip are float64 arrays, sorted by time within each file.
+    segments holds the index where each independent series begins: a new file
+    or a new driver face id (a fresh AlertState). breaks holds the indices
+    where the driver's face had been lost (replay CSV only; recordings do not
+    keep the frames without a sample).
+    """
+    if path.endswith('.csv'):
+        ts, ear, lip, face, breaks = _load_csv(path)
+        parts = [(ts, ear, lip, face)] if len(ts) else []
+    else:
+        from recorder import open_recording, open_recordings
+        recs = open_recordings(path) if os.path.isdir(path) else [open_recording(path)]
+        recs = [r[r['driver'] == 1] for r in recs]
+        parts = []
+        for r in recs:
+            if len(r):
+                order = np.argsort(r['ts'], kind='stable')
+                parts.append((r['ts'][order].astype(np.float64), r['ear'][order].astype(np.float64),
+                              r['lip'][order].astype(np.float64), r['face'][order]))
+        breaks = np.empty(0, dtype=np.intp)
+    if not parts:
+        empty = np.empty(0)
+        return empty, empty, empty, np.zeros(1, dtype=np.intp), breaks
+    starts, offset = [], 0
+    for p in parts:
+        starts.append(offset)
+        starts.extend(offset + np.flatnonzero(np.diff(p[3]) != 0) + 1)
+        offset += len(p[0])
+    ts, ear, lip = (np.concatenate([p[i] for p in parts]) for i in range(3))
+    return ts, ear, lip, np.array(starts, dtype=np.intp), breaks
+
+
+def load_labels(path):
+    """Return (starts, ends) arrays of labelled intervals, sorted by start."""
+    rows = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            try:
+                rows.append((float(row[0]), float(row[1])))
+            except (ValueError, IndexError):
+                continue  # header or blank line
+    rows.sort()
+    arr = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    return arr[:, 0], arr[:, 1]
+
+
+def _runs(active, breaks=None):
+    """(first, last) sample indices of every run of True in `active`.
+
+    A run is also cut before every index in `breaks`.
+    """
+    edges = np.diff(np.concatenate(([0], active.view(np.int8), [0])))
+    first, last = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+    if breaks is not None and len(breaks):
+        cut = breaks[(breaks > 0) & (breaks < len(active))]
+        cut = cut[active[cut] & active[cut - 1]]
+        if cut.size:
+            first = np.sort(np.concatenate((first, cut)))
+            last = np.sort(np.concatenate((last, cut - 1)))
+    return first, last
+
+
+def alert_times(ts, active, durations, rearm=None, segments=None, breaks=None):
+    """Alert times (runs x durations, NaN = no alert) for one threshold.
+
+    A run alerts at the first sample at least `duration` after the run's first
+    sample. Runs separated by no inactive sample (or, with `rearm`, by less
+    than `rearm` seconds of inactive samples: the yawn debounce) form one
+    episode, and only its first alert counts. `segments` (start indices of
+    separate series) keeps runs and episodes from spanning two series.
+    `breaks` (indices where the face had been lost) restart the run and the
+    re-arm timer there, as AlertState.mark_lost() does; episodes carry on.
+    """
+    breaks = np.empty(0, dtype=np.intp) if breaks is None else np.asarray(breaks, dtype=np.intp)
+    if segments is not None and len(segments) > 1:
+        bounds = list(segments) + [len(ts)]
+        return np.concatenate([
+            alert_times(ts[a:b], active[a:b], durations, rearm,
+                        breaks=breaks[(breaks >= a) & (breaks < b)] - a)
+            for a, b in zip(bounds[:-1], bounds[1:])])
+    first, last = _runs(active, breaks)
+    if not first.size:
+        return np.empty((0, len(durations)))
+    due = ts[first][:, None] + durations[None, :]
+    idx = np.searchsorted(ts, due, side='left')
+    fired = idx <= last[:, None]
+    out = np.where(fired, ts[np.minimum(idx, len(ts) - 1)], np.nan)
+    if first.size > 1:
+        # longest re-arm time reached in each inactive stretch between runs: the
+        # timer starts with the stretch and restarts at every break inside it
+        start, end = last[:-1] + 1, first[1:]
+        restart = np.zeros(len(ts), dtype=bool)
+        restart[start] = True
+        restart[breaks[breaks < len(ts)]] = True
+        clock = np.maximum.accumulate(np.where(restart, np.arange(len(ts)), 0))
+        held = ts - ts[clock]
+        gap = np.full(start.size, -1.0)
+        nonempty = end > start
+        if nonempty.any():
+            gap[nonempty] = np.maximum.reduceat(held, np.ravel([start[nonempty], end[nonempty]], 'F'))[::2]
+        episode = np.concatenate(([0], np.cumsum(gap >= (rearm or 0.0))))
+        for col in range(out.shape[1]):
+            fired_col = ~np.isnan(out[:, col])
+            # keep only the first firing run of every episode
+            ep = episode[fired_col]
+            keep = np.ones(ep.size, dtype=bool)
+            keep[1:] = ep[1:] != ep[:-1]
+            rows = np.flatnonzero(fired_col)
+            out[rows[~keep], col] = np.nan
+    return out
+
+
+def score(alerts, starts, ends, tolerance=0.0):
+    """Per-duration precision, recall, alert count and latency stats."""
+    n_cols = alerts.shape[1]
+    valid = ~np.isnan(alerts)
+    k = np.searchsorted(starts, np.where(valid, alerts, -np.inf), side='right') - 1
+    hit = valid & (k >= 0) & (alerts <= ends[np.maximum(k, 0)] + tolerance)
+    n_alerts = valid.sum(axis=0)
+    tp = hit.sum(axis=0)
+    first = np.full((len(starts), n_cols), np.inf)
+    rows, cols = np.nonzero(hit)
+    np.minimum.at(first, (k[rows, cols], cols), alerts[rows, cols])
+    detected = np.isfinite(first)
+    latency = np.where(detected, first - starts[:, None], np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        # intervals no combination detected give all-NaN latency columns
+        warnings.simplefilter('ignore', RuntimeWarning)
+        precision = np.where(n_alerts > 0, tp / np.maximum(n_alerts, 1), np.nan)
+        recall = detected.mean(axis=0) if len(starts) else np.full(n_cols, np.nan)
+        lat_mean = np.nanmean(latency, axis=0) if len(starts) else np.full(n_cols, np.nan)
+        lat_p50 = np.nanmedian(latency, axis=0) if len(starts) else np.full(n_cols, np.nan)
+    return precision, recall, n_alerts, lat_mean, lat_p50
+
+
+def _init(data):
+    _data.update(data)
+
+
+def _sweep_threshold(thresh):
+    d = _data
+    values = d['ear'] if d['mode'] == 'eyes' else d['lip']
+    active = values < thresh if d['mode'] == 'eyes' else values > thresh
+    alerts = alert_times(d['ts'], active, d['durations'], d['rearm'], d['segments'], d['breaks'])
+    return (thresh,) + score(alerts, d['starts'], d['ends'], d['tolerance'])
+
+
+def sweep(ts, ear, lip, starts, ends, thresholds, durations, mode='eyes', rearm=YAWN_REARM_SECONDS,
+          tolerance=0.0, workers=None, segments=None, breaks=None):
+    """Evaluate every (threshold, duration) pair; returns a list of result dicts."""
+    data = {
+        'ts': ts, 'ear': ear, 'lip': lip, 'starts': starts, 'ends': ends, 'mode': mode, 'segments': segments,
+        'breaks': breaks,
+        'durations': np.asarray(durations, dtype=np.float64), 'tolerance': tolerance,
+        'rearm': rearm if mode == 'yawn' else None,
+    }
+    if workers == 1:
+        _init(data)
+        parts = [_sweep_threshold(t) for t in thresholds]
+    else:
+        with Pool(workers, initializer=_init, initargs=(data,)) as pool:
+            parts = pool.map(_sweep_threshold, thresholds)
+    out = []
+    for thresh, precision, recall, n_alerts, lat_mean, lat_p50 in parts:
+        for j, dur in enumerate(data['durations']):
+            p, r = float(precision[j]), float(recall[j])
+            out.append({
+                'threshold': float(thresh), 'seconds': float(dur), 'alerts': int(n_alerts[j]),
+                'precision': p, 'recall': r,
+                'f1': 2 * p * r / (p + r) if p + r > 0 else 0.0,
+                'latency_mean_s': float(lat_mean[j]), 'latency_p50_s': float(lat_p50[j]),
+            })
+    return out
+
+
+def _grid(spec):
+    start, stop, step = (float(v) for v in spec.split(':'))
+    return np.round(np.arange(start, stop + step / 2, step), 6)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('series', help='replay CSV, recording .npy file or recording directory')
+    ap.add_argument('--labels', required=True, help='CSV of start,end of labelled intervals (Unix time for recordings)')
+    ap.add_argument('--mode', choices=('eyes', 'yawn'), default='eyes')
+    ap.add_argument('--thresholds', help='start:stop:step (default around the current threshold)')
+    ap.add_argument('--seconds', help='start:stop:step of alert durations')
+    ap.add_argument('--rearm', type=float, default=YAWN_REARM_SECONDS, help='yawn re-arm seconds')
+    ap.add_argument('--tolerance', type=float, default=0.0,
+                    help='seconds after a labelled interval during which an alert still counts')
+    ap.add_argument('--workers', type=int, default=None, help='processes (default: one per core)')
+    ap.add_argument('--out', help='write every combination to this CSV')
+    ap.add_argument('--top', type=int, default=10)
+    args = ap.parse_args()
+
+    if args.mode == 'eyes':
+        thresholds = _grid(args.thresholds or f"{EYE_AR_THRESH - 0.1}:{EYE_AR_THRESH + 0.05}:0.005")
+        durations = _grid(args.seconds or f"0.2:{EYE_AR_CONSEC_SECONDS * 3}:0.05")
+    else:
+        thresholds = _grid(args.thresholds or f"{YAWN_THRESH - 10}:{YAWN_THRESH + 15}:0.5")
+        durations = _grid(args.seconds or f"0:{YAWN_SECONDS * 6}:0.1")
+
+    ts, ear, lip, segments, breaks = load_series(args.series)
+    starts, ends = load_labels(args.labels)
+    print(f"{len(ts)} samples in {len(segments)} series, {len(starts)} labelled intervals, "
+          f"{len(thresholds) * len(durations)} combinations")
+    results = sweep(ts, ear, lip, starts, ends, thresholds, durations, args.mode, args.rearm,
+                    args.tolerance, args.workers, segments, breaks)
+
+    if args.out:
+        with open(args.out, 'w', newline='', encoding='utf-8') as f:
+            w = csv.DictWriter(f, fieldnames=list(results[0]))
+            w.writeheader()
+            w.writerows(results)
+    best = sorted(results, key=lambda r: (r['f1'], -np.nan_to_num(r['latency_mean_s'], nan=1e9)), reverse=True)
+    print(f"{'threshold':>9} {'seconds':>7} {'alerts':>6} {'precision':>9} {'recall':>6} {'f1':>5} {'lat mean':>8} {'lat p50':>7}")
+    for r in best[:args.top]:
+        print(f"{r['threshold']:9.3f} {r['seconds']:7.2f} {r['alerts']:6d} {r['precision']:9.2f} {r['recall']:6.2f} "
+              f"{r['f1']:5.2f} {r['latency_mean_s']:8.2f} {r['latency_p50_s']:7.2f}")
+
+
+if __name__ == '__main__':
+    main()